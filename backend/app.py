@@ -12,6 +12,8 @@ from routes.search_routes import search_bp
 from routes.interaction_routes import interaction_bp
 from routes.community_routes import community_bp
 from routes.regional_routes import regional_bp
+from ml.model_service import model_service
+from ml.retrain_scheduler import retrain_scheduler
 
 
 def create_app():
@@ -31,6 +33,15 @@ def create_app():
     app.register_blueprint(community_bp, url_prefix='/api')
     app.register_blueprint(regional_bp, url_prefix='/api')
 
+    # Model loads lazily on first use unless an explicit warmup is configured
+    if model_service.config['model'].get('warmup_on_start', False):
+        model_service.warmup()
+
+    # Pick up retrained models without a restart
+    model_service.start_registry_watcher()
+
+    # Optional background retraining (retrain.scheduler.enabled)
+    retrain_scheduler.start()
 
     @app.route('/')
     def index():
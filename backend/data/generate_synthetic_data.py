@@ -8,20 +8,14 @@ import os
 import random
 import sys
 import numpy as np
-import yaml
 
 # Add backend to path
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, BASE_DIR)
 
-from services.flavor_service import flavor_service
+from services.recipe_flavor_store import recipe_flavor_store, compute_recipe_flavor
 from utils.similarity import calculate_similarity
-
-
-def load_config():
-    config_path = os.path.join(BASE_DIR, 'config', 'model_config.yaml')
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+from utils.model_config import model_config
 
 
 def load_recipes():
@@ -32,11 +26,7 @@ def load_recipes():
 
 def calculate_recipe_flavor(ingredients):
     """Compute normalized flavor vector for a recipe's ingredients."""
-    total = np.zeros(5)
-    for ing in ingredients:
-        total += flavor_service.get_flavor_vector(ing)
-    norm = np.linalg.norm(total)
-    return total / norm if norm > 0 else total
+    return compute_recipe_flavor(ingredients)
 
 
 # --- Synthetic user profiles ---
@@ -67,7 +57,7 @@ def generate_interactions(recipes, config):
         user_flavor = np.array(user['flavor_vec'])
 
         for recipe in recipes:
-            recipe_flavor = calculate_recipe_flavor(recipe['ingredients'])
+            recipe_flavor = recipe_flavor_store.get(recipe['id'], recipe['ingredients'])
             flavor_sim = float(calculate_similarity(user_flavor, recipe_flavor))
 
             # Diet match?
@@ -111,7 +101,7 @@ def generate_interactions(recipes, config):
 
 
 def main():
-    config = load_config()
+    config = model_config.get()
     recipes = load_recipes()
 
     random.seed(42)
@@ -2,35 +2,35 @@
 Feature Builder for FlavorSense AI
 Computes numeric feature vectors for (user, recipe) pairs.
 No decision logic — pure numeric features only.
+
+Two equivalent paths:
+    build_features()          one (user, recipe) pair, plain Python
+    compute_feature_matrix()  columnar: RecipeColumns × UserColumns → (N, 7)
+                              float32 using NumPy operations only
+
+RecipeFeatureTable holds the recipe-side columns for a whole catalog,
+materialized once per catalog version; per request only the user-side
+transforms in compute_feature_matrix() run.
 """
 import os
 import sys
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
 import numpy as np
-import yaml
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, BASE_DIR)
 
-from services.flavor_service import flavor_service
+from services.recipe_flavor_store import recipe_flavor_store, compute_recipe_flavor
 from utils.similarity import calculate_similarity
-
-
-def load_model_config():
-    config_path = os.path.join(BASE_DIR, 'config', 'model_config.yaml')
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
-
-
-_config = load_model_config()
+from utils.model_config import model_config
 
 
 def calculate_recipe_flavor(ingredients):
     """Compute normalized flavor vector for a recipe."""
-    total = np.zeros(5)
-    for ing in ingredients:
-        total += flavor_service.get_flavor_vector(ing)
-    norm = np.linalg.norm(total)
-    return total / norm if norm > 0 else total
+    return compute_recipe_flavor(ingredients)
 
 
 def build_features(user_profile: dict, recipe: dict) -> list:
@@ -48,15 +48,16 @@ def build_features(user_profile: dict, recipe: dict) -> list:
                          budget_dist, ingredient_count, price_estimate]
     """
     # --- User features ---
+    users = model_config.get()['users']
     user_flavor = np.array(user_profile.get('flavor_vector', [0]*5), dtype=float)
     user_diet = user_profile.get('diet_type', '').lower()
-    user_cal = float(user_profile.get('calorie_goal', _config['users']['default_calorie_goal']))
+    user_cal = float(user_profile.get('calorie_goal', users['default_calorie_goal']))
     user_cuisine = user_profile.get('cuisine_preference', '').lower()
-    user_budget = float(user_profile.get('daily_budget', _config['users']['default_budget']))
+    user_budget = float(user_profile.get('daily_budget', users['default_budget']))
 
     # --- Recipe features ---
     ingredients = recipe.get('ingredients', [])
-    recipe_flavor = calculate_recipe_flavor(ingredients)
+    recipe_flavor = recipe_flavor_store.get(recipe.get('id'), ingredients)
     recipe_cal = float(recipe.get('nutrition', {}).get('calories', 0))
     recipe_cuisine = recipe.get('cuisine', '').lower()
     recipe_tags = [t.lower() for t in recipe.get('tags', recipe.get('diet_tags', []))]
@@ -108,6 +109,339 @@ FEATURE_NAMES = [
 ]
 
 
-def build_features_batch(user_profile: dict, recipes: list) -> list:
-    """Build feature vectors for a list of recipes against one user."""
-    return [build_features(user_profile, r) for r in recipes]
+# ── Columnar feature building ───────────────────────────────
+
+class _Vocabulary:
+    """Grow-only string → id mapping shared by recipe and user columns."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()  # request threads and the catalog both add
+
+    def add(self, value: str) -> int:
+        value_id = self._ids.get(value)
+        if value_id is not None:
+            return value_id
+        with self._lock:
+            return self._ids.setdefault(value, len(self._ids))
+
+    def lookup(self, value: str) -> int:
+        """Id of a known value, -1 if it was never seen on a recipe."""
+        return self._ids.get(value, -1)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._ids.keys())
+
+
+CUISINE_VOCAB = _Vocabulary()
+DIET_TAG_VOCAB = _Vocabulary()
+
+
+def _tag_masks(tag_ids: List[List[int]], words: int) -> np.ndarray:
+    """(N, words) uint64 bitmasks with bit `id` set for every tag id of a row."""
+    rows = []
+    for ids in tag_ids:
+        mask = [0] * words
+        for tag_id in ids:
+            mask[tag_id >> 6] |= 1 << (tag_id & 63)
+        rows.append(mask)
+    return np.array(rows, dtype=np.uint64).reshape(len(tag_ids), words)
+
+
+def recipe_side_inputs(recipe: dict) -> tuple:
+    """
+    Raw recipe-side inputs exactly as build_features() reads them:
+    (calories, price, ingredient_count, cuisine, tags), strings lowercased.
+    """
+    ingredients = recipe.get('ingredients', [])
+    return (
+        float(recipe.get('nutrition', {}).get('calories', 0)),
+        float(recipe.get('price', recipe.get('price_approx', len(ingredients) * 2.5))),
+        float(len(ingredients)),
+        recipe.get('cuisine', '').lower(),
+        tuple(t.lower() for t in recipe.get('tags', recipe.get('diet_tags', []))),
+    )
+
+
+@dataclass
+class RecipeColumns:
+    """Recipe-side inputs for N recipes, one array per attribute."""
+    flavors: np.ndarray            # (N, 5) normalized flavor vectors
+    calories: np.ndarray           # (N,)
+    prices: np.ndarray             # (N,)
+    ingredient_counts: np.ndarray  # (N,)
+    cuisine_ids: np.ndarray        # (N,) ids into CUISINE_VOCAB
+    diet_masks: np.ndarray         # (N, W) uint64 bitmasks over DIET_TAG_VOCAB
+
+    def __len__(self):
+        return len(self.calories)
+
+    def take(self, rows: np.ndarray) -> 'RecipeColumns':
+        """Row subset (fancy-index gather on every column)."""
+        return RecipeColumns(
+            self.flavors[rows], self.calories[rows], self.prices[rows],
+            self.ingredient_counts[rows], self.cuisine_ids[rows], self.diet_masks[rows],
+        )
+
+    def _masks(self, words: int) -> np.ndarray:
+        """diet_masks padded to `words` columns (tags added to the vocab since are unset)."""
+        width = self.diet_masks.shape[1]
+        if width >= words:
+            return self.diet_masks
+        return np.pad(self.diet_masks, ((0, 0), (0, words - width)))
+
+    def append(self, other: 'RecipeColumns') -> 'RecipeColumns':
+        """These rows followed by other's, as new arrays."""
+        words = max(self.diet_masks.shape[1], other.diet_masks.shape[1])
+        return RecipeColumns(
+            np.concatenate([self.flavors, other.flavors]),
+            np.concatenate([self.calories, other.calories]),
+            np.concatenate([self.prices, other.prices]),
+            np.concatenate([self.ingredient_counts, other.ingredient_counts]),
+            np.concatenate([self.cuisine_ids, other.cuisine_ids]),
+            np.concatenate([self._masks(words), other._masks(words)]),
+        )
+
+    def replace(self, rows: np.ndarray, other: 'RecipeColumns') -> 'RecipeColumns':
+        """Copy with `rows` overwritten by other's rows (these arrays are left untouched)."""
+        words = max(self.diet_masks.shape[1], other.diet_masks.shape[1])
+        columns = RecipeColumns(
+            self.flavors.copy(), self.calories.copy(), self.prices.copy(),
+            self.ingredient_counts.copy(), self.cuisine_ids.copy(), self._masks(words).copy(),
+        )
+        columns.flavors[rows] = other.flavors
+        columns.calories[rows] = other.calories
+        columns.prices[rows] = other.prices
+        columns.ingredient_counts[rows] = other.ingredient_counts
+        columns.cuisine_ids[rows] = other.cuisine_ids
+        columns.diet_masks[rows] = other._masks(words)
+        return columns
+
+    @classmethod
+    def from_inputs(cls, flavors: np.ndarray, inputs: Sequence[tuple]) -> 'RecipeColumns':
+        """Build columns from precomputed flavors and recipe_side_inputs() tuples."""
+        n = len(inputs)
+        calories = np.fromiter((r[0] for r in inputs), dtype=float, count=n)
+        prices = np.fromiter((r[1] for r in inputs), dtype=float, count=n)
+        counts = np.fromiter((r[2] for r in inputs), dtype=float, count=n)
+        cuisine_ids = np.fromiter((CUISINE_VOCAB.add(r[3]) for r in inputs), dtype=np.int64, count=n)
+        tag_ids = [[DIET_TAG_VOCAB.add(t) for t in r[4]] for r in inputs]
+        words = max(1, (len(DIET_TAG_VOCAB) + 63) // 64)
+        flavors = np.asarray(flavors, dtype=float).reshape(n, 5)
+        return cls(flavors, calories, prices, counts, cuisine_ids, _tag_masks(tag_ids, words))
+
+    @classmethod
+    def from_recipes(cls, recipes: list) -> 'RecipeColumns':
+        """Extract columns from recipe dicts (same keys build_features reads)."""
+        flavors = [recipe_flavor_store.get(r.get('id'), r.get('ingredients', [])) for r in recipes]
+        return cls.from_inputs(np.array(flavors).reshape(len(recipes), 5),
+                               [recipe_side_inputs(r) for r in recipes])
+
+
+@dataclass
+class UserColumns:
+    """User-side inputs: scalars for one user, or (N,)-shaped arrays for per-row users."""
+    flavor: np.ndarray             # (5,) or (N, 5)
+    calorie_goal: np.ndarray
+    daily_budget: np.ndarray
+    cuisine_id: np.ndarray         # -1 = no preference / unseen cuisine
+    diet_tag_id: np.ndarray        # -1 = diet never seen as a recipe tag
+
+    @classmethod
+    def from_profile(cls, user_profile: dict) -> 'UserColumns':
+        """Build after the RecipeColumns it is scored against (vocab lookups)."""
+        cuisine = user_profile.get('cuisine_preference', '').lower()
+        users = model_config.get()['users']
+        return cls(
+            flavor=np.array(user_profile.get('flavor_vector', [0]*5), dtype=float),
+            calorie_goal=np.float64(user_profile.get('calorie_goal', users['default_calorie_goal'])),
+            daily_budget=np.float64(user_profile.get('daily_budget', users['default_budget'])),
+            cuisine_id=np.int64(CUISINE_VOCAB.lookup(cuisine) if cuisine else -1),
+            diet_tag_id=np.int64(DIET_TAG_VOCAB.lookup(user_profile.get('diet_type', '').lower())),
+        )
+
+    @classmethod
+    def from_profiles(cls, user_profiles: Sequence[dict]) -> 'UserColumns':
+        """(U,)-shaped columns for many users; take() expands them to per-row users."""
+        users = [cls.from_profile(p) for p in user_profiles]
+        return cls(
+            flavor=np.array([u.flavor for u in users], dtype=float).reshape(len(users), 5),
+            calorie_goal=np.array([u.calorie_goal for u in users], dtype=float),
+            daily_budget=np.array([u.daily_budget for u in users], dtype=float),
+            cuisine_id=np.array([u.cuisine_id for u in users], dtype=np.int64),
+            diet_tag_id=np.array([u.diet_tag_id for u in users], dtype=np.int64),
+        )
+
+    def take(self, rows: np.ndarray) -> 'UserColumns':
+        """Row subset of from_profiles() columns (e.g. one row per (user, recipe) pair)."""
+        return UserColumns(
+            self.flavor[rows], self.calorie_goal[rows], self.daily_budget[rows],
+            self.cuisine_id[rows], self.diet_tag_id[rows],
+        )
+
+
+def compute_feature_matrix(user: UserColumns, recipes: RecipeColumns) -> np.ndarray:
+    """
+    Columnar equivalent of build_features(): returns the (N, 7) float32
+    matrix in FEATURE_NAMES order using NumPy operations only.
+    """
+    n = len(recipes)
+    X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float32)
+    if n == 0:
+        return X
+
+    # 1. Flavor similarity (cosine)
+    user_flavor = np.asarray(user.flavor, dtype=float)
+    user_norm = np.linalg.norm(user_flavor, axis=-1)
+    recipe_norm = np.linalg.norm(recipes.flavors, axis=1)
+    dots = recipes.flavors @ user_flavor if user_flavor.ndim == 1 else np.einsum('ij,ij->i', recipes.flavors, user_flavor)
+    denom = user_norm * recipe_norm
+    X[:, 0] = np.divide(dots, denom, out=np.zeros(n), where=denom > 0)
+
+    # 2. Calorie distance (normalized)
+    user_cal = np.asarray(user.calorie_goal, dtype=float)
+    X[:, 1] = np.abs(user_cal - recipes.calories) / np.maximum(user_cal, 1.0)
+
+    # 3. Cuisine match (binary)
+    cuisine_id = np.asarray(user.cuisine_id)
+    X[:, 2] = (cuisine_id >= 0) & (recipes.cuisine_ids == cuisine_id)
+
+    # 4. Diet match (binary): test the user's tag bit in each recipe's mask
+    diet_id = np.asarray(user.diet_tag_id)
+    words = recipes.diet_masks.shape[1]
+    valid = (diet_id >= 0) & (diet_id < words * 64)
+    safe_id = np.where(valid, diet_id, 0)
+    word = np.take_along_axis(
+        recipes.diet_masks, np.broadcast_to(safe_id // 64, (n,)).reshape(n, 1), axis=1
+    )[:, 0]
+    bit = np.left_shift(np.uint64(1), (safe_id % 64).astype(np.uint64))
+    X[:, 3] = valid & ((word & bit) != 0)
+
+    # 5. Budget distance (normalized, per-meal ≈ budget/3)
+    per_meal_budget = np.asarray(user.daily_budget, dtype=float) / 3.0
+    X[:, 4] = np.abs(per_meal_budget - recipes.prices) / np.maximum(per_meal_budget, 1.0)
+
+    # 6. Ingredient count (raw)
+    X[:, 5] = recipes.ingredient_counts
+
+    # 7. Price estimate (raw)
+    X[:, 6] = recipes.prices
+    return X
+
+
+RECIPE_FEATURES_PATH = os.path.join('ml', 'recipe_features.npz')  # relative to backend/
+
+
+class RecipeFeatureTable:
+    """
+    Recipe-side feature columns for a catalog, keyed by recipe id and tagged
+    with the catalog version they were materialized from.
+    Saved next to model_registry.json as an .npz (raw strings for cuisine and
+    tags, so vocab ids are rebuilt in whichever process loads it).
+
+    RecipeCatalog shares its row-aligned columns instead of gathering live
+    rows: it passes `row_of` (id → row), and rows whose id is None are not
+    part of the table. catalog_version may be a callable, evaluated on
+    first access.
+    """
+
+    def __init__(self, ids: Sequence[Optional[str]], columns: RecipeColumns,
+                 catalog_version: Union[str, Callable[[], str]],
+                 inputs: Optional[Sequence[tuple]] = None, row_of: Optional[Dict[str, int]] = None):
+        if row_of is None:
+            self._row_ids = [str(i) for i in ids]
+            self._row_of = {recipe_id: row for row, recipe_id in enumerate(self._row_ids)}
+        else:
+            self._row_ids = list(ids)
+            self._row_of = row_of
+        self.columns = columns
+        self._catalog_version = catalog_version
+        self._inputs = list(inputs) if inputs is not None else None
+
+    @property
+    def catalog_version(self) -> str:
+        if callable(self._catalog_version):
+            self._catalog_version = self._catalog_version()
+        return self._catalog_version
+
+    @property
+    def ids(self) -> List[str]:
+        """Recipe ids in row order."""
+        if len(self._row_of) == len(self._row_ids):
+            return list(self._row_ids)
+        return [recipe_id for recipe_id in self._row_ids if recipe_id is not None]
+
+    def __len__(self):
+        return len(self._row_of)
+
+    def __contains__(self, recipe_id):
+        return str(recipe_id) in self._row_of
+
+    @classmethod
+    def from_recipes(cls, recipes: list, catalog_version: str = '') -> 'RecipeFeatureTable':
+        inputs = [recipe_side_inputs(r) for r in recipes]
+        flavors = np.array([recipe_flavor_store.get(r.get('id'), r.get('ingredients', []))
+                            for r in recipes]).reshape(len(recipes), 5)
+        return cls([r.get('id') for r in recipes], RecipeColumns.from_inputs(flavors, inputs),
+                   catalog_version, inputs)
+
+    def rows_for(self, recipe_ids: Sequence) -> np.ndarray:
+        """Row numbers for ids (KeyError for ids not in the table)."""
+        return np.fromiter((self._row_of[str(i)] for i in recipe_ids), dtype=np.int64, count=len(recipe_ids))
+
+    def features_for(self, user_profile: dict, recipe_ids: Sequence) -> np.ndarray:
+        """(N, 7) feature matrix: gather recipe rows, then the user-side pass only."""
+        columns = self.columns.take(self.rows_for(recipe_ids))
+        return compute_feature_matrix(UserColumns.from_profile(user_profile), columns)
+
+    def features_for_users(self, user_profiles: Sequence[dict], owners: np.ndarray,
+                           rows: np.ndarray) -> np.ndarray:
+        """
+        Stacked (N, 7) matrix for many users at once: output row i pairs
+        user_profiles[owners[i]] with table row rows[i] (see rows_for()).
+        """
+        users = UserColumns.from_profiles(user_profiles).take(np.asarray(owners, dtype=np.int64))
+        return compute_feature_matrix(users, self.columns.take(np.asarray(rows, dtype=np.int64)))
+
+    def save(self, path: str):
+        if self._inputs is None:
+            raise ValueError("RecipeFeatureTable.save() needs the raw recipe inputs")
+        rows = [row for row, recipe_id in enumerate(self._row_ids) if recipe_id is not None]
+        columns = self.columns.take(np.asarray(rows, dtype=np.int64))
+        inputs = [self._inputs[row] for row in rows]
+        np.savez_compressed(
+            path,
+            ids=np.array([self._row_ids[row] for row in rows], dtype=str),
+            flavors=columns.flavors,
+            calories=columns.calories,
+            prices=columns.prices,
+            ingredient_counts=columns.ingredient_counts,
+            cuisines=np.array([r[3] for r in inputs], dtype=str),
+            tags=np.array(['\x1f'.join(r[4]) for r in inputs], dtype=str),
+            catalog_version=np.array(self.catalog_version),
+            feature_names=np.array(FEATURE_NAMES),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'RecipeFeatureTable':
+        with np.load(path, allow_pickle=False) as data:
+            if list(data['feature_names']) != FEATURE_NAMES:
+                raise ValueError(f"Feature schema mismatch in {path}")
+            inputs = [
+                (cal, price, count, cuisine, tuple(t for t in tags.split('\x1f') if t) if tags else ())
+                for cal, price, count, cuisine, tags in zip(
+                    data['calories'].tolist(), data['prices'].tolist(), data['ingredient_counts'].tolist(),
+                    data['cuisines'].tolist(), data['tags'].tolist())
+            ]
+            columns = RecipeColumns.from_inputs(data['flavors'], inputs)
+            return cls(data['ids'].tolist(), columns, str(data['catalog_version']), inputs)
+
+
+def build_features_batch(user_profile: dict, recipes: list) -> np.ndarray:
+    """Build the (N, 7) feature matrix for a list of recipes against one user."""
+    recipe_columns = RecipeColumns.from_recipes(recipes)
+    return compute_feature_matrix(UserColumns.from_profile(user_profile), recipe_columns)
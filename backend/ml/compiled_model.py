@@ -0,0 +1,348 @@
+"""
+Compiled Model for FlavorSense AI
+Flat NumPy representation of a trained XGBoost regressor, so the serving
+process can score candidates without importing xgboost or unpickling.
+
+Layout (T trees, padded to the largest tree's node count M):
+    features    (T, M) int32    split feature per node
+    thresholds  (T, M) float32  split threshold (go left when x < threshold)
+    left/right  (T, M) int32    child node ids, -1 at leaves
+    default_left(T, M) bool     branch taken for missing (NaN) values
+    values      (T, M) float32  leaf output (already scaled by learning rate)
+    cover       (T, M) float32  sum of hessians reaching each node
+
+contributions() gives per-row Saabas feature attributions from the same
+arrays. predict() evaluates every tree for every candidate at once. Missing-free
+inputs use per-feature bitvector tables (one searchsorted + one row gather
+per feature); inputs with NaNs walk the trees level by level.
+
+Artifacts are written by ml/model_store.py alongside the native model.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from features.feature_builder import FEATURE_NAMES
+
+IDENTITY_OBJECTIVES = ('reg:squarederror', 'reg:linear', 'reg:absoluteerror', 'reg:pseudohubererror')
+LOGISTIC_OBJECTIVES = ('reg:logistic', 'binary:logistic')
+
+
+class CompiledForest:
+    """Array-encoded tree ensemble with a vectorized evaluator."""
+
+    def __init__(self, features, thresholds, left, right, default_left, values, cover,
+                 base_margin: float, objective: str, feature_importances, feature_names):
+        self.features = np.asarray(features, dtype=np.int32)
+        self.thresholds = np.asarray(thresholds, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.cover = np.asarray(cover, dtype=np.float32)
+        self.base_margin = float(base_margin)
+        self.objective = str(objective)
+        self.feature_importances_ = np.asarray(feature_importances, dtype=np.float32)
+        self.feature_names = [str(f) for f in feature_names]
+        self.max_depth = _max_depth(self.left, self.right)
+        self._flatten()
+
+    @property
+    def n_trees(self) -> int:
+        return self.features.shape[0]
+
+    # ── Compilation ─────────────────────────────────────────────
+
+    @classmethod
+    def from_xgboost(cls, model) -> 'CompiledForest':
+        """Compile an XGBRegressor (or Booster) from its JSON model dump."""
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        learner = json.loads(booster.save_raw('json'))['learner']
+        objective = learner['objective']['name']
+        if objective not in IDENTITY_OBJECTIVES + LOGISTIC_OBJECTIVES:
+            raise ValueError(f"Unsupported objective for compilation: {objective}")
+        params = learner['learner_model_param']
+        if int(params.get('num_target', 1)) != 1 or int(params.get('num_class', 0)) > 1:
+            raise ValueError("Only single-output models can be compiled")
+        gbm = learner['gradient_booster']
+        if gbm.get('name', 'gbtree') != 'gbtree':
+            raise ValueError(f"Unsupported booster: {gbm.get('name')}")
+
+        trees = gbm['model']['trees']
+        width = max(len(t['left_children']) for t in trees)
+        shape = (len(trees), width)
+        features = np.zeros(shape, dtype=np.int32)
+        thresholds = np.zeros(shape, dtype=np.float32)
+        left = np.full(shape, -1, dtype=np.int32)
+        right = np.full(shape, -1, dtype=np.int32)
+        default_left = np.zeros(shape, dtype=bool)
+        values = np.zeros(shape, dtype=np.float32)
+        cover = np.zeros(shape, dtype=np.float32)
+        for t, tree in enumerate(trees):
+            if any(tree.get('split_type', [])):
+                raise ValueError("Categorical splits are not supported")
+            n = len(tree['left_children'])
+            left[t, :n] = tree['left_children']
+            right[t, :n] = tree['right_children']
+            features[t, :n] = tree['split_indices']
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+            is_leaf = left[t, :n] == -1
+            thresholds[t, :n] = np.where(is_leaf, 0, conditions)
+            values[t, :n] = np.where(is_leaf, conditions, 0)   # leaves store their value here
+            default_left[t, :n] = np.asarray(tree['default_left'], dtype=bool)
+            cover[t, :n] = tree['sum_hessian']
+
+        base_score = _parse_float(params['base_score'])
+        if objective in LOGISTIC_OBJECTIVES:
+            base_score = float(np.log(base_score / (1.0 - base_score)))
+
+        importances = getattr(model, 'feature_importances_', None)
+        if importances is None:
+            importances = np.zeros(len(FEATURE_NAMES))
+        names = booster.feature_names or FEATURE_NAMES
+        return cls(features, thresholds, left, right, default_left, values, cover,
+                   base_score, objective, importances, names)
+
+    # ── Inference ───────────────────────────────────────────────
+
+    def _flatten(self):
+        """
+        Evaluation arrays over global node ids (tree t, node i → t * M + i).
+        Leaves point to themselves, so every tree can take max_depth steps.
+        `_children` holds left children then right children: next node is
+        _children[node + went_right * size].
+        """
+        n_trees, width = self.features.shape
+        size = n_trees * width
+        offsets = (np.arange(n_trees, dtype=np.int64) * width)[:, None]
+        own = offsets + np.arange(width)
+        is_leaf = self.left == -1
+        self._roots = offsets[:, 0]
+        self._feature = np.where(is_leaf, 0, self.features).ravel().astype(np.int64)
+        self._threshold = self.thresholds.ravel()
+        self._default_right = (~self.default_left & ~is_leaf).ravel()
+        self._children = np.concatenate([
+            np.where(is_leaf, own, offsets + self.left).ravel(),
+            np.where(is_leaf, own, offsets + self.right).ravel(),
+        ])
+        self._size = size
+        self._leaf_values = self.values.ravel()
+        self._expected = _node_expectations(self.left, self.right, self.values, self.cover).ravel()
+        self._build_bitvectors()
+
+    def _build_bitvectors(self):
+        """
+        Bitvector tables for missing-free inputs (QuickScorer-style).
+
+        Leaves of each tree are numbered left to right and a row's state per
+        tree is a bitmask of leaves still reachable. A split that sends x
+        right removes its left subtree's leaves; the exit leaf is the lowest
+        surviving bit. Splits on feature f with threshold <= x are exactly a
+        prefix of f's sorted thresholds, so _bv_tables[f][k] holds the AND of
+        the first k splits' masks and a row needs one searchsorted + one row
+        gather per feature.
+        """
+        self._bv_tables = None
+        n_trees, width = self.features.shape
+        leaf_slot = np.full((n_trees, width), -1, dtype=np.int64)
+        left_leaves = np.zeros((n_trees, width), dtype=object)   # int bitmask of left subtree
+        n_leaves = 0
+        for t in range(n_trees):
+            count = 0
+
+            def visit(node):
+                nonlocal count
+                if self.left[t, node] == -1:
+                    leaf_slot[t, node] = count
+                    count += 1
+                    return 1 << (count - 1)
+                left = visit(self.left[t, node])
+                left_leaves[t, node] = left
+                return left | visit(self.right[t, node])
+
+            visit(0)
+            n_leaves = max(n_leaves, count)
+        if n_leaves > 64:
+            return
+
+        mask_dtype = next(d for d in (np.uint8, np.uint16, np.uint32, np.uint64)
+                          if np.iinfo(d).bits >= n_leaves)
+        bits = np.iinfo(mask_dtype).bits
+        full = (1 << bits) - 1
+        tables, bounds = [], []
+        for f in range(self.features_in):
+            trees, nodes = np.nonzero((self.left != -1) & (self.features == f))
+            thresholds = self.thresholds[trees, nodes]
+            order = np.argsort(thresholds, kind='stable')
+            thresholds, trees, nodes = thresholds[order], trees[order], nodes[order]
+            unique, starts = np.unique(thresholds, return_index=True)
+            table = np.full((len(unique) + 1, n_trees), full, dtype=mask_dtype)
+            current = [full] * n_trees
+            ends = list(starts[1:]) + [len(thresholds)]
+            for k, (start, end) in enumerate(zip(starts, ends)):
+                for t, node in zip(trees[start:end].tolist(), nodes[start:end].tolist()):
+                    current[t] &= full & ~left_leaves[t, node]
+                table[k + 1] = current
+            tables.append(table)
+            bounds.append(unique)
+
+        leaf_values = np.zeros((n_trees, bits), dtype=np.float32)
+        trees, nodes = np.nonzero(leaf_slot >= 0)
+        leaf_values[trees, leaf_slot[trees, nodes]] = self.values[trees, nodes]
+
+        self._bv_tables = tables
+        self._bv_bounds = bounds
+        self._bv_leaf_values = leaf_values.ravel()
+        self._bv_offsets = (np.arange(n_trees, dtype=np.int64) * bits)[None, :]
+        self._bv_lowbit = None
+        if bits <= 16:   # lowest-set-bit lookup table
+            v = np.arange(1, 1 << bits, dtype=np.int64)
+            self._bv_lowbit = np.zeros(1 << bits, dtype=np.int64)
+            self._bv_lowbit[1:] = np.log2(v & -v).astype(np.int64)
+
+    def leaf_indices(self, X: np.ndarray) -> np.ndarray:
+        """(N, T) global leaf node reached in every tree by every row of X."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, width = X.shape
+        flat_x = X.ravel()
+        row_base = (np.arange(n, dtype=np.int64) * width)[:, None]
+        has_missing = bool(np.isnan(flat_x).any())
+        node = np.broadcast_to(self._roots, (n, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = flat_x[row_base + self._feature[node]]
+            go_right = ~(x < self._threshold[node])   # NaN compares False → right…
+            if has_missing:                           # …unless the node defaults left
+                missing = np.isnan(x)
+                go_right &= ~missing | self._default_right[node]
+            node = self._children[node + go_right * self._size]
+        return node
+
+    def _predict_bitvector(self, X: np.ndarray) -> np.ndarray:
+        state = None
+        for f, (table, bounds) in enumerate(zip(self._bv_tables, self._bv_bounds)):
+            rows = table[np.searchsorted(bounds, X[:, f], side='right')]
+            if state is None:
+                state = rows
+            else:
+                state &= rows
+        if self._bv_lowbit is not None:
+            slot = self._bv_lowbit[state]
+        else:
+            state = state.astype(np.uint64)
+            slot = np.log2((state & (~state + np.uint64(1))).astype(np.float64)).astype(np.int64)
+        return self._bv_leaf_values[self._bv_offsets + slot].sum(axis=1, dtype=np.float32)
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.features_in)
+        if X.shape[0] == 0:
+            return np.zeros(0, dtype=np.float32)
+        if self._bv_tables is not None and not np.isnan(X).any():
+            total = self._predict_bitvector(X)
+        else:
+            total = self._leaf_values[self.leaf_indices(X)].sum(axis=1, dtype=np.float32)
+        return total + np.float32(self.base_margin)
+
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        """
+        Per-row feature contributions (Saabas): every split on a row's path
+        credits its feature with the change in expected output, where a
+        node's expectation is the cover-weighted mean of its leaves.
+        Returns (N, F + 1) in margin space; the last column is the bias and
+        each row sums to predict_margin().
+        """
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32).reshape(-1, self.features_in))
+        n, width = X.shape
+        out = np.zeros((n, width + 1), dtype=np.float64)
+        if n == 0:
+            return out.astype(np.float32)
+        flat_x = X.ravel()
+        row_base = (np.arange(n, dtype=np.int64) * width)[:, None]
+        out_base = (np.arange(n, dtype=np.int64) * (width + 1))[:, None]
+        node = np.broadcast_to(self._roots, (n, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            feature = self._feature[node]
+            x = flat_x[row_base + feature]
+            go_right = ~(x < self._threshold[node])
+            missing = np.isnan(x)
+            go_right &= ~missing | self._default_right[node]
+            child = self._children[node + go_right * self._size]
+            delta = self._expected[child] - self._expected[node]   # 0 once at a leaf
+            out += np.bincount((out_base + feature).ravel(), weights=delta.ravel(),
+                               minlength=out.size).reshape(out.shape)
+            node = child
+        out[:, -1] = self._expected[self._roots].sum() + self.base_margin
+        return out.astype(np.float32)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Same output as XGBRegressor.predict (float32)."""
+        margin = self.predict_margin(X)
+        if self.objective in LOGISTIC_OBJECTIVES:
+            return (1.0 / (1.0 + np.exp(-margin))).astype(np.float32)
+        return margin
+
+    @property
+    def features_in(self) -> int:
+        return len(self.feature_names)
+
+    # ── Persistence ─────────────────────────────────────────────
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            features=self.features, thresholds=self.thresholds,
+            left=self.left, right=self.right, default_left=self.default_left,
+            values=self.values, cover=self.cover,
+            base_margin=np.array(self.base_margin), objective=np.array(self.objective),
+            feature_importances=self.feature_importances_,
+            feature_names=np.array(self.feature_names),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'CompiledForest':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['features'], data['thresholds'], data['left'], data['right'],
+                data['default_left'], data['values'], data['cover'],
+                float(data['base_margin']), str(data['objective']),
+                data['feature_importances'], data['feature_names'].tolist(),
+            )
+
+
+def _parse_float(raw) -> float:
+    """base_score is serialized as '0.5' or '[5E-1]' depending on xgboost version."""
+    return float(str(raw).strip('[]').split(',')[0])
+
+
+def _node_expectations(left, right, values, cover) -> np.ndarray:
+    """(T, M) expected output under each node: leaf value or cover-weighted child mean."""
+    expected = values.astype(np.float64)
+    for t in range(left.shape[0]):
+        for node in range(left.shape[1] - 1, -1, -1):  # children before parents
+            l, r = left[t, node], right[t, node]
+            if l != -1:
+                total = cover[t, l] + cover[t, r]
+                expected[t, node] = ((cover[t, l] * expected[t, l] + cover[t, r] * expected[t, r]) / total
+                                     if total > 0 else 0.5 * (expected[t, l] + expected[t, r]))
+    return expected
+
+
+def _max_depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Longest root-to-leaf path over all trees (number of splits)."""
+    depth = np.zeros(left.shape, dtype=np.int32)
+    deepest = 0
+    for t in range(left.shape[0]):
+        for node in range(left.shape[1]):  # xgboost numbers children after parents
+            if left[t, node] != -1:
+                depth[t, left[t, node]] = depth[t, right[t, node]] = depth[t, node] + 1
+                deepest = max(deepest, depth[t, node] + 1)
+    return deepest
+
+
+def compiled_name(model_name: str) -> str:
+    """model_v3.ubj → model_v3.npz"""
+    return os.path.splitext(model_name)[0] + '.npz'
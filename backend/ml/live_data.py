@@ -0,0 +1,107 @@
+"""
+Live interaction bookkeeping shared by the server and the retrain scripts.
+Import-light (no pandas / xgboost), so request-side code can use it.
+
+Row counts come from a manifest next to the CSV
+(user_interactions_live.csv.manifest.json: {"rows", "bytes"}), which the
+interaction logger updates under the CSV's flock on every append. Reading
+it is O(1): one stat() plus a tiny JSON read. If the CSV changed behind the
+manifest's back, only the bytes past the recorded size are scanned, or the
+whole file if it shrank (replaced/truncated).
+"""
+import json
+import os
+from typing import Optional
+
+from utils.file_lock import FileLock
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIVE_PATH = os.path.join(BASE_DIR, 'data', 'user_interactions_live.csv')
+
+
+def manifest_path(path: str = LIVE_PATH) -> str:
+    return path + '.manifest.json'
+
+
+def read_manifest(path: str = LIVE_PATH) -> Optional[dict]:
+    try:
+        with open(manifest_path(path), 'r') as f:
+            manifest = json.load(f)
+        return {"rows": int(manifest["rows"]), "bytes": int(manifest["bytes"])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def write_manifest(path: str, rows: int, size: int):
+    """Atomically replace the manifest (caller holds the CSV's lock)."""
+    target = manifest_path(path)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({"rows": rows, "bytes": size}, f)
+    os.replace(tmp, target)
+
+
+def _count_rows(path: str, start: int, end: int) -> int:
+    """Newline-terminated lines in [start, end); the header line counts when start == 0."""
+    lines = 0
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            remaining -= len(chunk)
+    return lines - 1 if start == 0 and lines else lines
+
+
+def reconcile(path: str, size: int, manifest: Optional[dict]) -> int:
+    """Row count for a CSV of `size` bytes, starting from a (possibly stale) manifest."""
+    if manifest is not None and manifest["bytes"] == size:
+        return manifest["rows"]
+    if manifest is not None and 0 < manifest["bytes"] < size:
+        return manifest["rows"] + _count_rows(path, manifest["bytes"], size)
+    return _count_rows(path, 0, size) if size else 0
+
+
+def record_append(path: str, size_before: int, rows: int, size_after: int):
+    """Advance the manifest after an append (caller holds the CSV's lock)."""
+    manifest = read_manifest(path)
+    if manifest is not None and manifest["bytes"] == size_before:
+        total = manifest["rows"] + rows
+    else:
+        total = reconcile(path, size_after, manifest)
+    write_manifest(path, total, size_after)
+
+
+def count_live_interactions(path: str = LIVE_PATH) -> int:
+    """Live CSV data rows, from the manifest (O(1) while it is current)."""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    manifest = read_manifest(path)
+    if manifest is not None and manifest["bytes"] == size:
+        return manifest["rows"]
+
+    # Stale or missing: catch up, and persist it unless a writer is busy
+    rows = reconcile(path, size, manifest)
+    lock = FileLock(path + '.lock')
+    if lock.acquire(blocking=False):
+        try:
+            if os.path.getsize(path) == size:
+                write_manifest(path, rows, size)
+        finally:
+            lock.release()
+    return rows
+
+
+def live_watermark(registry: dict) -> dict:
+    """Live rows (and byte offset) the registry's current model was trained on."""
+    return registry.get('training_data', {}).get('live_watermark', {"rows": 0, "offset": 0})
+
+
+def new_live_interactions(registry: dict) -> int:
+    """Live rows past the registry's watermark (not yet trained on)."""
+    return max(0, count_live_interactions() - live_watermark(registry).get('rows', 0))
@@ -0,0 +1,117 @@
+"""
+Micro-Batcher for FlavorSense AI
+Collects concurrent prediction calls for a few milliseconds and scores them
+as one stacked feature matrix, so threaded workers make one model call per
+burst instead of one per request.
+
+    batcher = MicroBatcher(max_wait_ms=3, max_batch_rows=4096)
+    scores = batcher.predict(model, X)   # blocks until this caller's rows are scored
+
+Calls are grouped by model object, so requests that started before a hot
+swap are still scored by the model they snapshotted. close() stops the
+worker after it has scored everything queued so far; later calls are
+scored directly in the caller's thread.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Queue + worker thread that stacks concurrent predict() calls."""
+
+    def __init__(self, max_wait_ms: float = 3.0, max_batch_rows: int = 4096):
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_batch_rows = max(1, int(max_batch_rows))
+        self._queue: "queue.Queue[Optional[Tuple[object, np.ndarray, Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stop_seen = False
+        self._worker = threading.Thread(target=self._run, name="model-micro-batcher", daemon=True)
+        self._worker.start()
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+
+    def predict(self, model, X: np.ndarray) -> np.ndarray:
+        """Score X with model as part of the next batch; returns this caller's scores."""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                return np.asarray(model.predict(X))
+            self._queue.put((model, X, future))
+        return future.result()
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Stop the worker once queued calls are scored (idempotent)."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)  # FIFO: everything queued before it is still scored
+        self._worker.join(timeout)
+
+    # ── Worker ──────────────────────────────────────────────────
+
+    def _collect(self) -> List[Tuple[object, np.ndarray, Future]]:
+        """Block for one call, then gather more until max_wait or max_batch_rows."""
+        first = self._queue.get()
+        if first is None:
+            self._stop_seen = True
+            return []
+        batch = [first]
+        rows = len(batch[0][1])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stop_seen = True
+                break
+            batch.append(item)
+            rows += len(item[1])
+        return batch
+
+    def _run(self):
+        while not self._stop_seen:
+            batch = self._collect()
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[0]), []).append(item)
+            for items in groups.values():
+                self._score(items)
+
+    def _score(self, items: List[Tuple[object, np.ndarray, Future]]):
+        model = items[0][0]
+        try:
+            stacked = np.vstack([X for _, X, _ in items])
+            scores = np.asarray(model.predict(stacked))
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+        offsets = np.cumsum([0] + [len(X) for _, X, _ in items])
+        for (_, _, future), start, end in zip(items, offsets[:-1], offsets[1:]):
+            future.set_result(scores[start:end])
+        self._batches += 1
+        self._requests += len(items)
+        self._rows += int(offsets[-1])
+
+    def get_stats(self) -> dict:
+        return {
+            "batches": self._batches,
+            "requests": self._requests,
+            "rows": self._rows,
+            "avg_requests_per_batch": round(self._requests / self._batches, 2) if self._batches else 0.0,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch_rows": self.max_batch_rows,
+        }
@@ -1,179 +1,553 @@
 """
 Model Service for FlavorSense AI (v2)
-- Loads model from model_registry.json
+- Loads model from model_registry.json (compiled NumPy arrays or native
+  XGBoost format), lazily on first use or in an explicit warmup()
+- Hot-swaps new registry models after a background load + warmup
+- Batch ranking of many users with one model call (rank_recipes_batch)
+- Optional cross-request micro-batching of predictions (model.batching)
+- Per-request latency budget with cosine fallback (model.deadline_ms)
+- Follows live model_config.yaml edits (top_n, deadline, batching, poll
+  interval at once; engine / models_dir from the next model load)
 - Returns confidence (prediction variance proxy)
-- Returns feature-level explanations
+- Returns per-feature contribution explanations on request (top-N only)
 - Includes response timing metadata
 """
 import os
 import sys
 import json
-import pickle
+import threading
 import time
-import yaml
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
 import numpy as np
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, BASE_DIR)
 
-from features.feature_builder import build_features_batch, build_features, FEATURE_NAMES
-from utils.similarity import calculate_similarity
+from features.feature_builder import FEATURE_NAMES
+from services.recipe_catalog import recipe_catalog
+from ml.compiled_model import CompiledForest, compiled_name
+from ml.model_store import load_model_file, model_version, verify_artifact
+from ml.micro_batcher import MicroBatcher
+from utils.latency import CostEstimator
+from utils.similarity import batch_cosine_similarity, top_k_indices
+from utils.model_config import model_config
+
 
+REGISTRY_PATH = os.path.join(BASE_DIR, 'ml', 'model_registry.json')
+DEFAULT_POLL_SECONDS = 10
+DEADLINE_PROBE_EVERY = 20  # predicted overruns still run ML once per this many, to refresh the estimate
+LEGACY_MODEL_PATHS = [os.path.join(BASE_DIR, 'ml', 'model.ubj'), os.path.join(BASE_DIR, 'ml', 'model.pkl')]
 
-def _load_config():
-    config_path = os.path.join(BASE_DIR, 'config', 'model_config.yaml')
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+# Canned feature rows (FEATURE_NAMES order) scored before a model goes live
+WARMUP_BATCH = np.array([
+    [0.9, 0.1, 1.0, 1.0, 0.2, 6.0, 8.0],
+    [0.5, 0.5, 0.0, 1.0, 0.6, 10.0, 15.0],
+    [0.1, 1.2, 0.0, 0.0, 1.5, 3.0, 4.0],
+    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+] * 8, dtype=np.float32)
 
 
-def _load_registry():
-    registry_path = os.path.join(BASE_DIR, 'ml', 'model_registry.json')
+def _load_registry() -> Optional[dict]:
+    """Parsed model_registry.json, or None if it is missing, unreadable or partly written."""
     try:
-        with open(registry_path, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return {"current_model": None}
+        with open(REGISTRY_PATH, 'r') as f:
+            registry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[ModelService] Could not read registry: {e}")
+        return None
+    return registry if isinstance(registry, dict) else None
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """A loaded model and the registry entry it came from — swapped as one unit."""
+    model: object
+    version: Optional[str]
+    registry: dict
+    engine: str
+    loaded_at: str
+
+    @property
+    def model_key(self) -> tuple:
+        return _model_key(self.registry)
 
 
 class ModelService:
     """Ranks recipes using trained ML model with cosine-similarity fallback."""
 
     def __init__(self):
-        self.config = _load_config()
-        self.registry = _load_registry()
-        self.model = None
-        self.model_version = None
-        self._load_model()
-
-    def _load_model(self):
-        """Load model from versioned registry."""
-        model_name = self.registry.get('current_model')
+        self._bundle: Optional[ModelBundle] = None  # loaded lazily (_current / warmup)
+        self._previous: Optional[ModelBundle] = None
+        self._swaps = 0
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._registry_mtime: Optional[float] = None
+        self._ml_cost = CostEstimator()
+        self._deadline_stats = {"requests": 0, "predicted_fallbacks": 0, "feature_fallbacks": 0,
+                                "misses": 0, "probes": 0}
+        self._stats_lock = threading.Lock()  # not _reload_lock: a reload holds it through load + warmup
+        self._skipped_since_probe = 0
+        self._batcher: Optional[MicroBatcher] = None
+        self._configure_batching(self.config)
+        model_config.subscribe(self._on_config_change)
+
+    @property
+    def config(self):
+        """Current model_config.yaml snapshot (read-only)."""
+        return model_config.get()
+
+    def _configure_batching(self, config):
+        batching = config['model'].get('batching', {}) or {}
+        if not batching.get('enabled', False):
+            batcher, self._batcher = self._batcher, None
+            if batcher is not None:
+                batcher.close()  # calls already queued on it still complete
+        elif self._batcher is None:
+            self._batcher = MicroBatcher(
+                max_wait_ms=batching.get('max_wait_ms', 3),
+                max_batch_rows=batching.get('max_batch_rows', 4096),
+            )
+        else:
+            self._batcher.max_wait = max(0.0, float(batching.get('max_wait_ms', 3))) / 1000.0
+            self._batcher.max_batch_rows = max(1, int(batching.get('max_batch_rows', 4096)))
+
+    def _on_config_change(self, new, old):
+        if new['model'].get('batching') != old.section('model').get('batching'):
+            self._configure_batching(new)
+            print(f"[ModelService] Micro-batching {'on' if self._batcher else 'off'}")
+
+    # ── Loading ─────────────────────────────────────────────────
+
+    def _load_bundle(self, registry: dict) -> ModelBundle:
+        """Load the registry's current model into a new bundle (no shared state touched)."""
+        loaded_at = datetime.now().isoformat(timespec='seconds')
+        model_name = registry.get('current_model')
         if not model_name:
             print("[ModelService] No model in registry — using cosine fallback")
-            return
+            return ModelBundle(None, None, registry, "none", loaded_at)
 
         models_dir = os.path.join(BASE_DIR, self.config['model'].get('models_dir', 'ml/models'))
-        model_path = os.path.join(models_dir, model_name)
-
-        # Fallback to legacy path
-        if not os.path.exists(model_path):
-            model_path = os.path.join(BASE_DIR, 'ml', 'model.pkl')
+        version = model_version(model_name)
+
+        # Compiled engine: flat NumPy arrays, no xgboost import or unpickling
+        if self.config['model'].get('engine', 'xgboost') == 'compiled':
+            try:
+                compiled_path = verify_artifact(registry, models_dir,
+                                                registry.get('compiled_model') or compiled_name(model_name))
+                model = CompiledForest.load(compiled_path)
+                print(f"[ModelService] Loaded compiled {model_name} from {compiled_path}")
+                return ModelBundle(model, version, registry, "compiled", loaded_at)
+            except FileNotFoundError as e:
+                print(f"[ModelService] No compiled model at {e} — loading {model_name}")
+            except Exception as e:
+                print(f"[ModelService] Error loading compiled model: {e} — loading {model_name}")
 
         try:
-            with open(model_path, 'rb') as f:
-                self.model = pickle.load(f)
-            self.model_version = model_name.replace('.pkl', '')
+            try:
+                model_path = verify_artifact(registry, models_dir, model_name)
+            except FileNotFoundError:
+                # Fallback to legacy path (ml/model.ubj or .pkl from older train_model.py runs)
+                model_path = next((p for p in LEGACY_MODEL_PATHS if os.path.exists(p)), LEGACY_MODEL_PATHS[-1])
+            model = load_model_file(model_path)
             print(f"[ModelService] Loaded {model_name} from {model_path}")
-        except FileNotFoundError:
-            print(f"[ModelService] Model not found at {model_path} — cosine fallback")
+            return ModelBundle(model, version, registry, "xgboost", loaded_at)
+        except FileNotFoundError as e:
+            print(f"[ModelService] Model not found at {e.filename or e} — cosine fallback")
         except Exception as e:
             print(f"[ModelService] Error loading model: {e} — cosine fallback")
+        return ModelBundle(None, None, registry, "none", loaded_at)
+
+    def _current(self) -> ModelBundle:
+        """Serving bundle, loading the registry's model on first use."""
+        bundle = self._bundle
+        if bundle is None:
+            with self._reload_lock:
+                if self._bundle is None:
+                    self._bundle = self._load_bundle(_load_registry() or {"current_model": None})
+                    self._registry_mtime = _registry_mtime()
+                    self._log_serving()
+                bundle = self._bundle
+        return bundle
+
+    def warmup(self) -> dict:
+        """Explicit warmup phase: load the model now and score the canned batch."""
+        bundle = self._current()
+        self._warmup(bundle)
+        return self.get_serving_info()
+
+    @staticmethod
+    def _warmup(bundle: ModelBundle):
+        """Score the canned batch once; raises if the model is unusable."""
+        if bundle.model is None:
+            return
+        scores = np.asarray(bundle.model.predict(WARMUP_BATCH))
+        if scores.shape != (len(WARMUP_BATCH),) or not np.all(np.isfinite(scores)):
+            raise ValueError(f"warmup produced invalid scores for {bundle.version}")
+
+    def _log_serving(self):
+        print(f"[ModelService] Serving {self._bundle.version or 'cosine fallback'} "
+              f"({self._bundle.engine}, pid {os.getpid()})")
+
+    # ── Hot swap ────────────────────────────────────────────────
 
-    def reload_model(self):
-        """Hot-reload model from updated registry."""
-        self.registry = _load_registry()
-        self._load_model()
+    def reload_model(self, registry: Optional[dict] = None) -> bool:
+        """
+        Load the registry's current model in the calling thread, warm it up,
+        then swap it in with a single reference assignment. Requests already
+        running keep the bundle they started with. Returns True if swapped.
+        A registry that cannot be read or parsed leaves the current model in place.
+        """
+        with self._reload_lock:
+            registry = registry or _load_registry()
+            current = self._bundle.version if self._bundle else None
+            if registry is None:
+                print(f"[ModelService] Keeping {current} — registry unreadable")
+                return False
+            bundle = self._load_bundle(registry)
+            if bundle.model is None and registry.get('current_model'):
+                print(f"[ModelService] Keeping {current} — new model failed to load")
+                return False
+            try:
+                self._warmup(bundle)
+            except Exception as e:
+                print(f"[ModelService] Keeping {current} — {e}")
+                return False
+            self._previous, self._bundle = self._bundle, bundle
+            self._swaps += 1
+            self._log_serving()
+            return True
+
+    def rollback(self) -> bool:
+        """Swap back to the previously serving model (kept warm in memory)."""
+        with self._reload_lock:
+            if self._previous is None:
+                return False
+            self._previous, self._bundle = self._bundle, self._previous
+            self._swaps += 1
+            print("[ModelService] Rolled back")
+            self._log_serving()
+            return True
+
+    def check_registry(self) -> bool:
+        """Reload if model_registry.json now names a different model."""
+        if self._bundle is None:
+            return False  # not loaded yet; first use reads the latest registry
+        mtime = _registry_mtime()
+        if mtime == self._registry_mtime:
+            return False
+        registry = _load_registry()
+        if registry is None:
+            return False  # mid-write or corrupt: treat as unchanged, retry next poll
+        self._registry_mtime = mtime
+        if _model_key(registry) == self._bundle.model_key:
+            return False
+        print("[ModelService] Registry changed — loading new model")
+        return self.reload_model(registry)
+
+    def start_registry_watcher(self):
+        """Poll the registry in a daemon thread (model.registry_poll_seconds, 0 disables)."""
+        def interval():
+            return float(self.config['model'].get('registry_poll_seconds', DEFAULT_POLL_SECONDS))
+
+        if interval() <= 0 or self._watcher is not None:
+            return
+
+        def watch():
+            while True:
+                # Re-read each round: a config edit changes the rate, 0 pauses polling
+                seconds = interval()
+                time.sleep(seconds if seconds > 0 else DEFAULT_POLL_SECONDS)
+                if seconds <= 0:
+                    continue
+                try:
+                    self.check_registry()
+                except Exception as e:
+                    print(f"[ModelService] Registry watcher error: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="model-registry-watcher", daemon=True)
+        self._watcher.start()
+
+    # ── Serving state ───────────────────────────────────────────
+
+    @property
+    def model(self):
+        return self._current().model
+
+    @property
+    def model_key(self) -> tuple:
+        """Identity of the serving model (name + checksums); changes on every swap."""
+        return self._current().model_key
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self._current().version
+
+    @property
+    def registry(self) -> dict:
+        return self._current().registry
 
     @property
     def is_ml_ready(self) -> bool:
         return self.model is not None
 
+    @property
+    def engine(self) -> str:
+        return self._current().engine
+
     @property
     def features_used(self) -> int:
         return len(self.config.get('features', []))
 
-    def get_metadata(self) -> dict:
+    def get_serving_info(self) -> dict:
+        """Which model this worker is serving, and what it would roll back to."""
+        bundle, previous = self._bundle, self._previous
+        if bundle is None:
+            return {"model_version": None, "loaded": False, "pid": os.getpid(),
+                    "watching_registry": self._watcher is not None}
+        return {
+            "model_version": bundle.version or "none",
+            "loaded": True,
+            "engine": bundle.engine,
+            "loaded_at": bundle.loaded_at,
+            "previous_version": (previous.version or "none") if previous else None,
+            "swaps": self._swaps,
+            "pid": os.getpid(),
+            "watching_registry": self._watcher is not None,
+            "batching": self._batcher.get_stats() if self._batcher else None,
+            "deadline": self.get_deadline_stats(),
+        }
+
+    def get_deadline_stats(self) -> dict:
+        """How often the ML path fell back to cosine or overran its latency budget."""
+        with self._stats_lock:
+            stats = dict(self._deadline_stats)
+        requests = stats["requests"]
+        overruns = stats["predicted_fallbacks"] + stats["feature_fallbacks"] + stats["misses"]
+        stats["deadline_ms"] = self.config['model'].get('deadline_ms', 0)
+        stats["miss_rate"] = round(overruns / requests, 4) if requests else 0.0
+        stats["ml_cost"] = self._ml_cost.get_stats()
+        return stats
+
+    def get_metadata(self, bundle: Optional[ModelBundle] = None) -> dict:
         """Returns model metadata for response enrichment."""
+        bundle = bundle or self._current()
         return {
-            "model_version": self.model_version or "none",
+            "model_version": bundle.version or "none",
+            "engine": bundle.engine,
             "features_used": self.features_used,
-            "trained_on": self.registry.get('trained_on', 'unknown'),
-            "training_samples": self.registry.get('samples', 0),
+            "trained_on": bundle.registry.get('trained_on', 'unknown'),
+            "training_samples": bundle.registry.get('samples', 0),
+            "feature_table_version": bundle.registry.get('recipe_features', {}).get('catalog_version', 'none'),
         }
 
-    def rank_recipes(self, user_profile: dict, recipes: list, top_n: int = None) -> dict:
+    def rank_recipes(self, user_profile: dict, recipes: list, top_n: int = None,
+                     explain: bool = False, deadline_ms: Optional[float] = None) -> dict:
         """
         Rank recipes for a given user.
 
+        deadline_ms (default model.deadline_ms, 0 = none) budgets feature
+        building + prediction. If the ML path is predicted to overrun it, or
+        has already overrun it once features are built, the cosine ranking
+        is returned with ranking_source "cosine_fallback_deadline".
+
         Returns dict with:
-            ranked: List of (score, recipe, explanation) tuples
+            ranked: List of (score, recipe, explanation, confidence) tuples;
+                    explanation is None unless explain=True
             metadata: model version, timing, etc.
         """
         start_time = time.time()
+        bundle = self._current()  # one model for the whole request, even across a swap
 
         if top_n is None:
             top_n = self.config['model']['top_n']
+        if deadline_ms is None:
+            deadline_ms = self.config['model'].get('deadline_ms', 0)
 
         if not recipes:
-            return {"ranked": [], "metadata": self.get_metadata(), "time_ms": 0}
+            return {"ranked": [], "metadata": self.get_metadata(bundle), "time_ms": 0}
 
-        if self.is_ml_ready:
-            ranked = self._rank_ml(user_profile, recipes, top_n)
-            source = "ml_model"
-        else:
-            ranked = self._rank_cosine(user_profile, recipes, top_n)
-            source = "cosine_fallback"
+        ranked = None
+        source = "cosine_fallback"
+        if bundle.model is not None:
+            ranked = self._rank_ml_within(bundle.model, user_profile, recipes, top_n, explain, deadline_ms)
+            source = "ml_model" if ranked is not None else "cosine_fallback_deadline"
+        if ranked is None:
+            ranked = self._rank_cosine(user_profile, recipes, top_n, explain)
 
         elapsed_ms = round((time.time() - start_time) * 1000, 1)
 
-        metadata = self.get_metadata()
+        metadata = self.get_metadata(bundle)
         metadata["ranking_source"] = source
         metadata["recommendation_time_ms"] = elapsed_ms
+        metadata["deadline_ms"] = deadline_ms
 
         return {"ranked": ranked, "metadata": metadata}
 
-    def _rank_ml(self, user_profile, recipes, top_n):
-        """Rank using trained XGBoost model with explanations."""
-        feature_matrix = build_features_batch(user_profile, recipes)
-        X = np.array(feature_matrix)
+    def _rank_ml_within(self, model, user_profile, recipes, top_n, explain, deadline_ms):
+        """
+        ML ranking under a latency budget; None means "use the cosine fallback".
+        A predicted overrun still runs the ML path once every DEADLINE_PROBE_EVERY
+        requests, so one slow outlier cannot switch ML off for good.
+        """
+        with self._stats_lock:
+            self._deadline_stats["requests"] += 1
+            if deadline_ms and self._ml_cost.estimate(len(recipes)) > deadline_ms:
+                self._skipped_since_probe += 1
+                if self._skipped_since_probe < DEADLINE_PROBE_EVERY:
+                    self._deadline_stats["predicted_fallbacks"] += 1
+                    return None
+                self._deadline_stats["probes"] += 1
+            self._skipped_since_probe = 0
+
+        start = time.perf_counter()
+        deadline = start + deadline_ms / 1000.0 if deadline_ms else None
+        ranked = self._rank_ml(model, user_profile, recipes, top_n, explain, deadline)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if ranked is not None:
+            # Runs cut short after feature building would understate the cost
+            self._ml_cost.observe(len(recipes), elapsed_ms)
+        with self._stats_lock:
+            if ranked is None:
+                self._deadline_stats["feature_fallbacks"] += 1
+            elif deadline is not None and elapsed_ms > deadline_ms:
+                self._deadline_stats["misses"] += 1
+        return ranked
+
+    def _rank_ml(self, model, user_profile, recipes, top_n, explain=False, deadline=None):
+        """
+        Rank using the trained model; explanations only for the returned top-N.
+        Returns None if `deadline` (a perf_counter time) passes while building features.
+        """
+        # Recipe-side columns come precomputed from the catalog; only the
+        # user-side transforms run per request
+        table = recipe_catalog.feature_table(ensure=recipes)
+        X = table.features_for(user_profile, [recipe.get('id') for recipe in recipes])
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+
+        # Predict relevance scores (stacked with concurrent requests when batching is on)
+        scores = np.asarray(self._predict(model, X))
+
+        top = top_k_indices(scores, top_n)
+        confidence = _ml_confidence(scores, top)
+
+        explanations = [None] * len(top)
+        if explain and len(top):
+            # Per-row feature contributions (last column is the bias term)
+            contribs = np.round(feature_contributions(model, X[top])[:, :len(FEATURE_NAMES)].astype(float), 4)
+            explanations = [dict(zip(FEATURE_NAMES, row)) for row in contribs.tolist()]
+
+        return [
+            (score, recipes[i], explanation, round(conf, 3))
+            for i, score, explanation, conf in zip(top.tolist(), scores[top].tolist(),
+                                                   explanations, confidence.tolist())
+        ]
+
+    def rank_recipes_batch(self, user_profiles: list, recipes: list, candidates: list,
+                           top_n: int = None) -> dict:
+        """
+        Rank for many users in one pass over a shared recipe list.
+
+        candidates[u] holds the indices into `recipes` user u may be shown.
+        All (user, recipe) pairs are stacked into one feature matrix and
+        scored with a single model call (cosine similarity if no model).
+
+        Returns dict with:
+            ranked: one list of (score, recipe, None, confidence) per user
+            metadata: model version, ranking_source, timing
+        """
+        start_time = time.time()
+        bundle = self._current()
+        if top_n is None:
+            top_n = self.config['model']['top_n']
+
+        counts = np.array([len(c) for c in candidates], dtype=np.int64)
+        ranked = [[] for _ in candidates]
+        source = "ml_model" if bundle.model is not None else "cosine_fallback"
+        if counts.sum():
+            table = recipe_catalog.feature_table(ensure=recipes)
+            recipe_rows = table.rows_for([recipe.get('id') for recipe in recipes])
+            flat = np.concatenate([np.asarray(c, dtype=np.int64) for c in candidates])
+            owners = np.repeat(np.arange(len(candidates)), counts)
+            X = table.features_for_users(user_profiles, owners, recipe_rows[flat])
+            # One model call for every user; flavor_similarity is the cosine fallback score
+            scores = np.asarray(bundle.model.predict(X)) if bundle.model is not None else X[:, 0].astype(float)
+
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            for u, (lo, hi) in enumerate(zip(offsets[:-1].tolist(), offsets[1:].tolist())):
+                if lo == hi:
+                    continue
+                user_scores = scores[lo:hi]
+                top = top_k_indices(user_scores, top_n)
+                if bundle.model is not None:
+                    confidence = _ml_confidence(user_scores, top).tolist()
+                else:
+                    confidence = user_scores[top].tolist()
+                ranked[u] = [
+                    (score, recipes[i], None, round(conf, 3))
+                    for i, score, conf in zip(flat[lo + top].tolist(), user_scores[top].tolist(), confidence)
+                ]
+
+        metadata = self.get_metadata(bundle)
+        metadata["ranking_source"] = source
+        metadata["recommendation_time_ms"] = round((time.time() - start_time) * 1000, 1)
+        metadata["pairs_scored"] = int(counts.sum())
+        return {"ranked": ranked, "metadata": metadata}
 
-        # Predict relevance scores
-        scores = self.model.predict(X)
+    def _predict(self, model, X: np.ndarray) -> np.ndarray:
+        if self._batcher is not None:
+            return self._batcher.predict(model, X)
+        return model.predict(X)
 
-        # Confidence: use prediction margin from mean as proxy
-        mean_score = float(np.mean(scores))
-        std_score = float(np.std(scores)) if len(scores) > 1 else 0.0
+    def _rank_cosine(self, user_profile, recipes, top_n, explain=False):
+        """Fallback: rank by cosine similarity only."""
+        from services.recipe_flavor_store import recipe_flavor_store
 
-        # Feature importances from the model
-        model_importances = self.model.feature_importances_
+        user_flavor = np.array(user_profile.get('flavor_vector', [0]*5), dtype=float)
+        flavors = np.array([
+            recipe_flavor_store.get(recipe.get('id'), recipe.get('ingredients', []))
+            for recipe in recipes
+        ])
 
+        sims = batch_cosine_similarity(user_flavor, flavors)
         results = []
-        for i, (score, recipe) in enumerate(zip(scores.tolist(), recipes)):
-            # Per-recipe explanation: feature_value * model_importance
-            features = feature_matrix[i]
-            explanation = {}
-            for fname, fval, fimp in zip(FEATURE_NAMES, features, model_importances):
-                explanation[fname] = round(float(fval) * float(fimp), 4)
+        for i in top_k_indices(sims, top_n):
+            sim = float(sims[i])
+            explanation = {"flavor_similarity": round(sim, 4)} if explain else None
+            results.append((sim, recipes[i], explanation, round(sim, 3)))
+        return results
 
-            # Confidence: higher when prediction is further from mean
-            confidence = round(min(1.0, abs(score - mean_score) / max(std_score, 0.01) * 0.5), 3)
 
-            results.append((score, recipe, explanation, confidence))
+def _ml_confidence(scores: np.ndarray, top: np.ndarray) -> np.ndarray:
+    """Confidence for the top rows: higher when a prediction is further from the mean."""
+    mean_score = float(np.mean(scores))
+    std_score = float(np.std(scores)) if len(scores) > 1 else 0.0
+    return np.minimum(1.0, np.abs(scores[top] - mean_score) / max(std_score, 0.01) * 0.5)
 
-        results.sort(key=lambda x: x[0], reverse=True)
-        return results[:top_n]
 
-    def _rank_cosine(self, user_profile, recipes, top_n):
-        """Fallback: rank by cosine similarity only."""
-        from services.flavor_service import flavor_service
+def feature_contributions(model, X: np.ndarray) -> np.ndarray:
+    """(N, F + 1) per-row feature contributions (Saabas) for either engine."""
+    if isinstance(model, CompiledForest):
+        return model.contributions(X)
+    from xgboost import DMatrix
+    return model.get_booster().predict(DMatrix(X), pred_contribs=True, approx_contribs=True)
 
-        user_flavor = np.array(user_profile.get('flavor_vector', [0]*5), dtype=float)
-        results = []
 
-        for recipe in recipes:
-            ingredients = recipe.get('ingredients', [])
-            total = np.zeros(5)
-            for ing in ingredients:
-                total += flavor_service.get_flavor_vector(ing)
-            norm = np.linalg.norm(total)
-            recipe_flavor = total / norm if norm > 0 else total
+def _model_key(registry: dict) -> tuple:
+    return (registry.get('current_model'), registry.get('compiled_model'),
+            tuple(sorted(registry.get('checksums', {}).items())))
 
-            sim = float(calculate_similarity(user_flavor, recipe_flavor))
-            explanation = {"flavor_similarity": round(sim, 4)}
-            results.append((sim, recipe, explanation, round(sim, 3)))
 
-        results.sort(key=lambda x: x[0], reverse=True)
-        return results[:top_n]
+def _registry_mtime() -> Optional[float]:
+    try:
+        return os.path.getmtime(REGISTRY_PATH)
+    except OSError:
+        return None
 
 
 # Singleton
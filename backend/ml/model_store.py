@@ -0,0 +1,162 @@
+"""
+Model Store for FlavorSense AI
+Saves and loads model artifacts listed in model_registry.json.
+
+Artifacts per version (in ml/models/):
+    model_vN.ubj   XGBoost native binary format (version-stable, no pickle)
+    model_vN.npz   Compiled NumPy arrays (see compiled_model.py)
+
+The registry entry records a sha256 checksum for each file and the feature
+schema the model was trained on; loading verifies both before use.
+xgboost is only imported when a native model is actually loaded or saved.
+
+Migrate the registry's current model (e.g. a legacy .pkl) to these artifacts:
+    python backend/ml/model_store.py
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from features.feature_builder import FEATURE_NAMES
+from ml.compiled_model import CompiledForest, compiled_name
+
+NATIVE_FORMAT = '.ubj'
+VERSION_PATTERN = re.compile(r'^model_v(\d+)\.')
+
+
+class ModelArtifactError(Exception):
+    """A registry artifact is missing, corrupted, or was trained on another schema."""
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_version(model_name: str) -> str:
+    """model_v3.ubj → model_v3"""
+    return os.path.splitext(model_name)[0]
+
+
+def next_model_version(models_dir: str, registry: dict = None) -> str:
+    """
+    model_vN one past the highest version among the model_v* files in
+    models_dir and the registry history, so a pruned or reset history
+    never reuses the name of an existing artifact.
+    """
+    names = os.listdir(models_dir) if os.path.isdir(models_dir) else []
+    names += [entry.get('version') or '' for entry in (registry or {}).get('history', [])]
+    versions = [int(m.group(1)) for m in map(VERSION_PATTERN.match, names) if m]
+    return f"model_v{max(versions, default=0) + 1}"
+
+
+def save_model_artifacts(model, models_dir: str, version: str, overwrite: bool = False) -> dict:
+    """
+    Save a fitted XGBRegressor as native .ubj plus compiled .npz.
+    Returns the registry fields describing them. Existing files are only
+    replaced with overwrite=True (FileExistsError otherwise).
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    model_name = version + NATIVE_FORMAT
+    compiled = compiled_name(model_name)
+    if not overwrite:
+        for name in (model_name, compiled):
+            if os.path.exists(os.path.join(models_dir, name)):
+                raise FileExistsError(f"{name} already exists in {models_dir}")
+    model.save_model(os.path.join(models_dir, model_name))
+    CompiledForest.from_xgboost(model).save(os.path.join(models_dir, compiled))
+    return {
+        "current_model": model_name,
+        "compiled_model": compiled,
+        "checksums": {
+            model_name: file_sha256(os.path.join(models_dir, model_name)),
+            compiled: file_sha256(os.path.join(models_dir, compiled)),
+        },
+        "feature_schema": list(FEATURE_NAMES),
+    }
+
+
+def write_registry(registry: dict, path: str, indent: int = 2):
+    """
+    Replace model_registry.json atomically: write a temp file in the same
+    directory, then os.replace() it, so registry watchers never read a
+    partly written file.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(registry, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def verify_artifact(registry: dict, models_dir: str, name: str) -> str:
+    """Path of a registry artifact after checking its checksum and feature schema."""
+    path = os.path.join(models_dir, name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    schema = registry.get('feature_schema')
+    if schema is not None and list(schema) != FEATURE_NAMES:
+        raise ModelArtifactError(f"{name} was trained on features {schema}, serving uses {FEATURE_NAMES}")
+    expected = registry.get('checksums', {}).get(name)
+    if expected is not None and file_sha256(path) != expected:
+        raise ModelArtifactError(f"Checksum mismatch for {name}")
+    return path
+
+
+def load_native(path: str):
+    """Load a .ubj/.json model into an XGBRegressor (imports xgboost)."""
+    from xgboost import XGBRegressor
+    model = XGBRegressor()
+    model.load_model(path)
+    return model
+
+
+def load_model_file(path: str):
+    """Native formats by extension; legacy .pkl files are still unpickled."""
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    return load_native(path)
+
+
+def main():
+    registry_path = os.path.join(BASE_DIR, 'ml', 'model_registry.json')
+    with open(registry_path, 'r') as f:
+        registry = json.load(f)
+    model_name = registry.get('current_model')
+    if not model_name:
+        print("[ModelStore] No model in registry.")
+        return
+
+    models_dir = os.path.join(BASE_DIR, 'ml', 'models')
+    model = load_model_file(os.path.join(models_dir, model_name))
+    # Same version name: the migration deliberately replaces its own artifacts
+    artifacts = save_model_artifacts(model, models_dir, model_version(model_name), overwrite=True)
+
+    registry.update(artifacts)
+    for entry in registry.get('history', []):
+        if entry.get('version') == model_name:
+            entry['version'] = artifacts['current_model']
+            entry['compiled_model'] = artifacts['compiled_model']
+            entry['checksums'] = artifacts['checksums']
+    write_registry(registry, registry_path, indent=4)
+    print(f"[ModelStore] {model_name} → {artifacts['current_model']}, {artifacts['compiled_model']}")
+
+
+if __name__ == '__main__':
+    main()
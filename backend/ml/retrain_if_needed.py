@@ -1,19 +1,30 @@
 """
 Auto Retrain Script for FlavorSense AI
-Merges synthetic + live interactions, retrains XGBoost, updates model registry.
-
-Run:
-    python backend/ml/retrain_if_needed.py
+Trains on live interactions and updates the model registry.
+
+Two modes:
+    incremental  continue boosting the registry's current model on only the
+                 live rows after the watermark (cost grows with new data,
+                 not total history)
+    full         rebuild from scratch on synthetic + all live rows; forced
+                 with --full, when there is no usable base model, or after
+                 retrain.full_rebuild_every incremental versions
+
+The live CSV is append-only: the registry's training_data.live_watermark
+(rows + byte offset) marks what the current model has already seen, and
+each version records its training-data lineage.
+
+Run (or let ml/retrain_scheduler.py run it in the background):
+    python backend/ml/retrain_if_needed.py [--force] [--full]
 """
+import io
 import os
 import sys
 import json
-import pickle
 from datetime import datetime
 
 import pandas as pd
 import numpy as np
-import yaml
 from xgboost import XGBRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
@@ -21,14 +32,19 @@ from sklearn.metrics import mean_squared_error
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, BASE_DIR)
 
-from features.feature_builder import build_features, FEATURE_NAMES
-from data.generate_synthetic_data import SYNTHETIC_USERS
-
+from features.feature_builder import FEATURE_NAMES, RECIPE_FEATURES_PATH
+from services.recipe_catalog import recipe_catalog
+from ml.model_store import (ModelArtifactError, save_model_artifacts, next_model_version,
+                            verify_artifact, load_model_file, write_registry)
+from ml.training_data import build_training_matrix, model_params, SYNTHETIC_PROFILES, GENERIC_PROFILE
+from ml.live_data import LIVE_PATH, count_live_interactions, live_watermark
+from ml.retrain_scheduler import RETRAIN_LOCK_PATH, LOCK_HELD_ENV
+from utils.file_lock import FileLock
+from utils.model_config import model_config
 
-def load_config():
-    config_path = os.path.join(BASE_DIR, 'config', 'model_config.yaml')
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+SYNTHETIC_PATH = os.path.join(BASE_DIR, 'data', 'user_interactions.csv')
+REGISTRY_PATH = os.path.join(BASE_DIR, 'ml', 'model_registry.json')
+MODELS_DIR = os.path.join(BASE_DIR, 'ml', 'models')
 
 
 def load_recipes():
@@ -37,56 +53,117 @@ def load_recipes():
         return json.load(f)
 
 
-def get_user_profile(user_id):
-    for u in SYNTHETIC_USERS:
-        if u['id'] == user_id:
-            return {
-                'flavor_vector': u['flavor_vec'],
-                'diet_type': u['diet'],
-                'calorie_goal': u['calorie_goal'],
-                'cuisine_preference': u['cuisine'],
-                'daily_budget': u['budget'],
-            }
-    # For live users, return a generic profile
-    return {
-        'flavor_vector': [0.5] * 5,
-        'diet_type': 'non-veg',
-        'calorie_goal': 2000,
-        'cuisine_preference': '',
-        'daily_budget': 30,
-    }
-
-
-def count_live_interactions():
-    csv_path = os.path.join(BASE_DIR, 'data', 'user_interactions_live.csv')
-    if not os.path.exists(csv_path):
-        return 0
-    with open(csv_path, 'r') as f:
-        return sum(1 for _ in f) - 1  # minus header
-
-
-def merge_interactions():
-    """Merge synthetic + live interaction CSVs."""
-    synthetic_path = os.path.join(BASE_DIR, 'data', 'user_interactions.csv')
-    live_path = os.path.join(BASE_DIR, 'data', 'user_interactions_live.csv')
+def load_registry():
+    """
+    The model registry, or an empty one if none exists yet. A registry that
+    exists but cannot be parsed aborts with ModelArtifactError instead of
+    being replaced, which would lose its history.
+    """
+    try:
+        with open(REGISTRY_PATH, 'r') as f:
+            registry = json.load(f)
+    except FileNotFoundError:
+        return {"history": []}
+    except (OSError, ValueError) as e:
+        raise ModelArtifactError(f"Cannot read {REGISTRY_PATH} ({e}); restore or fix it before training")
+    if not isinstance(registry, dict):
+        raise ModelArtifactError(f"{REGISTRY_PATH} is not a JSON object; restore or fix it before training")
+    return registry
+
+
+def read_live_since(offset: int):
+    """
+    Live rows after byte `offset` (0 = from the start), complete lines only.
+    Returns (DataFrame, end_offset), or (None, 0) if the file is shorter than
+    the offset (it was replaced, so the watermark no longer applies).
+    """
+    if not os.path.exists(LIVE_PATH):
+        return pd.DataFrame(), 0
+    with open(LIVE_PATH, 'rb') as f:
+        header = f.readline()
+        if os.fstat(f.fileno()).st_size < offset:
+            return None, 0
+        start = max(offset, len(header))
+        f.seek(start)
+        data = f.read()
+    complete = data[:data.rfind(b'\n') + 1]  # a writer may be mid-line
+    columns = header.decode('utf-8').strip().split(',')
+    frame = pd.read_csv(io.BytesIO(complete), names=columns, header=None) if complete else pd.DataFrame(columns=columns)
+    return frame, start + len(complete)
+
+
+def load_all_interactions():
+    """Synthetic + every live row: (interactions, synthetic_rows, live_rows, live_end_offset)."""
+    synthetic = pd.read_csv(SYNTHETIC_PATH) if os.path.exists(SYNTHETIC_PATH) else pd.DataFrame()
+    live, end_offset = read_live_since(0)
+    return pd.concat([synthetic, live], ignore_index=True), len(synthetic), live, end_offset
+
+
+def tuned_training_config(config: dict, registry: dict) -> dict:
+    """config.training with the winning tune_model.py parameters (if any) applied."""
+    return {**config['training'], **registry.get('tuning', {}).get('params', {})}
+
+
+def load_base_booster(registry: dict):
+    """Booster of the registry's current native model, or None."""
+    model_name = registry.get('current_model')
+    if not model_name:
+        return None
+    try:
+        return load_model_file(verify_artifact(registry, MODELS_DIR, model_name)).get_booster()
+    except Exception as e:
+        print(f"[Retrain] Base model unavailable ({e})")
+        return None
+
+
+def fit_and_score(X, y, training_cfg: dict, n_estimators: int, base_booster=None):
+    """Fit (continuing base_booster if given) on a train split; RMSE on the held-out rows."""
+    if len(X) * training_cfg['test_size'] >= 1:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=training_cfg['test_size'], random_state=training_cfg['random_state']
+        )
+    else:
+        # Too few rows to hold any out: score in-sample
+        X_train, X_test, y_train, y_test = X, X, y, y
 
-    dfs = []
-    if os.path.exists(synthetic_path):
-        dfs.append(pd.read_csv(synthetic_path))
-    if os.path.exists(live_path):
-        dfs.append(pd.read_csv(live_path))
+    model = XGBRegressor(
+        n_estimators=n_estimators,
+        random_state=training_cfg['random_state'],
+        verbosity=0,
+        **model_params(training_cfg)
+    )
+    model.fit(X_train, y_train, xgb_model=base_booster)
 
-    if not dfs:
-        return pd.DataFrame()
-    return pd.concat(dfs, ignore_index=True)
+    y_pred = model.predict(X_test)
+    rmse = round(float(np.sqrt(mean_squared_error(y_test, y_pred))), 4)
+    return model, rmse
 
 
 def main():
-    config = load_config()
-    threshold = config.get('retrain', {}).get('min_new_interactions', 50)
-    live_count = count_live_interactions()
-
-    print(f"[Retrain] Live interactions: {live_count} / {threshold} threshold")
+    # One retrain at a time across workers and manual runs (the scheduler
+    # holds the lock itself while this script runs as its subprocess)
+    if os.environ.get(LOCK_HELD_ENV) != '1':
+        lock = FileLock(RETRAIN_LOCK_PATH)
+        if not lock.acquire(blocking=False):
+            print("[Retrain] Another retrain is running. Exiting.")
+            return
+        try:
+            return retrain()
+        finally:
+            lock.release()
+    return retrain()
+
+
+def retrain():
+    config = model_config.get()
+    retrain_cfg = config.get('retrain', {})
+    threshold = retrain_cfg.get('min_new_interactions', 50)
+    registry = load_registry()
+    watermark = live_watermark(registry)
+
+    live_total = count_live_interactions()
+    live_count = max(0, live_total - watermark['rows'])
+    print(f"[Retrain] New live interactions: {live_count} / {threshold} threshold ({live_total} total)")
 
     # Allow force retrain via --force flag
     force = '--force' in sys.argv
@@ -95,97 +172,115 @@ def main():
         print("[Retrain] Not enough new interactions. Use --force to override.")
         return
 
-    print("[Retrain] Threshold met — retraining...")
+    # Incremental unless a full rebuild is requested or due
+    lineage = registry.get('training_data', {})
+    full = '--full' in sys.argv
+    if not full and lineage.get('incremental_since_full', 0) >= retrain_cfg.get('full_rebuild_every', 24):
+        print("[Retrain] full_rebuild_every reached — full rebuild")
+        full = True
+    base_booster = None if full else load_base_booster(registry)
+    new_rows = None
+    if not full and base_booster is not None:
+        new_rows, end_offset = read_live_since(watermark['offset'])
+        if new_rows is None:
+            print("[Retrain] Live CSV is shorter than the watermark — full rebuild")
+    if new_rows is None or base_booster is None:
+        full = True
+
+    print(f"[Retrain] Threshold met — {'full rebuild' if full else 'incremental'} retraining...")
 
     recipes_list = load_recipes()
-    recipes_map = {str(r['id']): r for r in recipes_list}
-    interactions = merge_interactions()
+    training_cfg = tuned_training_config(config, registry)
+    if full:
+        interactions, synthetic_rows, new_rows, end_offset = load_all_interactions()
+        live_start = 0
+    else:
+        interactions = new_rows
+        # Legacy registries without lineage: the base model saw only synthetic rows
+        synthetic_rows = lineage.get('synthetic_rows', registry.get('samples', 0))
+        live_start = watermark['rows']
+    live_end = live_start + len(new_rows)
 
     if interactions.empty:
         print("[Retrain] No interactions found. Aborting.")
         return
 
-    training_cfg = config['training']
-
-    # Build features
-    X_rows, y_rows = [], []
-    for _, row in interactions.iterrows():
-        user_profile = get_user_profile(row['user_id'])
-        recipe = recipes_map.get(str(row['recipe_id']))
-        if recipe is None:
-            continue
-        features = build_features(user_profile, recipe)
-        X_rows.append(features)
-        y_rows.append(float(row['rating']))
-
-    X = np.array(X_rows)
-    y = np.array(y_rows)
+    # Build features (vectorized join; live users get the generic profile)
+    X, y = build_training_matrix(interactions, recipes_list, SYNTHETIC_PROFILES,
+                                 default_profile=GENERIC_PROFILE)
     total_samples = len(X)
-    print(f"[Retrain] Samples: {total_samples} ({live_count} live + {total_samples - live_count} synthetic)")
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=training_cfg['test_size'], random_state=training_cfg['random_state']
-    )
-
-    model = XGBRegressor(
-        n_estimators=training_cfg['n_estimators'],
-        max_depth=training_cfg['max_depth'],
-        learning_rate=training_cfg['learning_rate'],
-        random_state=training_cfg['random_state'],
-        verbosity=0
-    )
-    model.fit(X_train, y_train)
+    if total_samples == 0:
+        print("[Retrain] No interactions match known recipes. Aborting.")
+        return
+    print(f"[Retrain] Samples: {total_samples} (live rows {live_start}–{live_end})")
 
-    y_pred = model.predict(X_test)
-    rmse = round(float(np.sqrt(mean_squared_error(y_test, y_pred))), 4)
+    if full:
+        model, rmse = fit_and_score(X, y, training_cfg, training_cfg['n_estimators'])
+    else:
+        model, rmse = fit_and_score(X, y, training_cfg, retrain_cfg.get('incremental_estimators', 20),
+                                    base_booster=base_booster)
     print(f"[Retrain] RMSE: {rmse}")
 
-    # Determine next version number
-    registry_path = os.path.join(BASE_DIR, 'ml', 'model_registry.json')
-    try:
-        with open(registry_path, 'r') as f:
-            registry = json.load(f)
-    except Exception:
-        registry = {"history": []}
-
+    # Next version: past every model_v* artifact on disk, not just the history
     history = registry.get('history', [])
-    next_version = len(history) + 1
-    model_name = f"model_v{next_version}.pkl"
-
-    # Save model
-    models_dir = os.path.join(BASE_DIR, 'ml', 'models')
-    os.makedirs(models_dir, exist_ok=True)
-    model_path = os.path.join(models_dir, model_name)
-    with open(model_path, 'wb') as f:
-        pickle.dump(model, f)
-    print(f"[Retrain] Saved → {model_name}")
-
-    # Update registry
+
+    # Save model (native .ubj + compiled .npz, with checksums and feature schema)
+    artifacts = save_model_artifacts(model, MODELS_DIR, next_model_version(MODELS_DIR, registry))
+    model_name = artifacts['current_model']
+    print(f"[Retrain] Saved → {model_name}, {artifacts['compiled_model']}")
+
+    # Recipe-side feature table, versioned alongside the model
+    table = recipe_catalog.feature_table(ensure=recipes_list)
+    table_path = os.path.join(BASE_DIR, RECIPE_FEATURES_PATH)
+    table.save(table_path)
+    print(f"[Retrain] Recipe features: {len(table)} rows (catalog {table.catalog_version})")
+
+    # Training-data lineage: what this version has seen, and what it was built on
+    training_data = {
+        "mode": "full" if full else "incremental",
+        "base_model": None if full else registry.get('current_model'),
+        "synthetic_rows": synthetic_rows,
+        "live_rows": [live_start, live_end],
+        "live_watermark": {"rows": live_end, "offset": end_offset},
+        "incremental_since_full": 0 if full else lineage.get('incremental_since_full', 0) + 1,
+        "total_trees": int(model.get_booster().num_boosted_rounds()),
+    }
+
+    # Update registry (tuning results carry over to the new version)
+    previous = registry
     today = datetime.now().strftime('%Y-%m-%d')
     history.append({
         "version": model_name,
         "trained_on": today,
         "samples": total_samples,
         "rmse": rmse,
+        "compiled_model": artifacts['compiled_model'],
+        "checksums": artifacts['checksums'],
+        "catalog_version": table.catalog_version,
+        "training_data": training_data,
     })
     registry = {
         "current_model": model_name,
+        "compiled_model": artifacts['compiled_model'],
+        "checksums": artifacts['checksums'],
+        "feature_schema": artifacts['feature_schema'],
         "trained_on": today,
         "samples": total_samples,
         "rmse": rmse,
         "features_used": len(FEATURE_NAMES),
+        "recipe_features": {
+            "path": RECIPE_FEATURES_PATH,
+            "catalog_version": table.catalog_version,
+            "rows": len(table),
+            "feature_names": FEATURE_NAMES,
+        },
+        "training_data": training_data,
         "history": history,
     }
-    with open(registry_path, 'w') as f:
-        json.dump(registry, f, indent=2)
-    print(f"[Retrain] Registry updated → {model_name}")
-
-    # Clear live interactions (already folded into training)
-    live_path = os.path.join(BASE_DIR, 'data', 'user_interactions_live.csv')
-    if os.path.exists(live_path):
-        os.remove(live_path)
-        print("[Retrain] Cleared user_interactions_live.csv")
-
+    if 'tuning' in previous:
+        registry['tuning'] = previous['tuning']
+    write_registry(registry, REGISTRY_PATH)
+    print(f"[Retrain] Registry updated → {model_name} (live watermark {live_end})")
     print("[Retrain] Complete.")
 
 
@@ -0,0 +1,172 @@
+"""
+Retrain Scheduler for FlavorSense AI
+Optional in-process trigger for ml/retrain_if_needed.py (retrain.scheduler).
+
+A daemon thread checks every check_seconds (or sooner, when /api/interaction
+calls notify()) whether a retrain is due:
+    threshold  min_new_interactions live rows past the registry's watermark
+    interval   any new rows, and the registry is older than interval_minutes
+
+Retraining runs in a subprocess, so request threads never wait on it and
+training never shares the server's GIL or memory. A flock() on
+ml/.retrain.lock lets only one worker of a gunicorn pool retrain at a time;
+the others skip that round. The new model is published through
+model_registry.json, and every worker's registry watcher hot-swaps it in.
+
+Thresholds and timings follow live edits of model_config.yaml; flipping
+`enabled` on needs a restart (or start()).
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ml.live_data import new_live_interactions
+from utils.file_lock import FileLock
+from utils.model_config import model_config
+
+RETRAIN_SCRIPT = os.path.join(BASE_DIR, 'ml', 'retrain_if_needed.py')
+RETRAIN_LOCK_PATH = os.path.join(BASE_DIR, 'ml', '.retrain.lock')
+LOCK_HELD_ENV = 'FLAVORSENSE_RETRAIN_LOCK_HELD'  # tells the subprocess its parent holds the lock
+REGISTRY_PATH = os.path.join(BASE_DIR, 'ml', 'model_registry.json')
+
+
+def _load_registry() -> dict:
+    try:
+        with open(REGISTRY_PATH, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+class RetrainScheduler:
+    """Background thread that runs retrain_if_needed.py when it is due."""
+
+    def __init__(self, config: Optional[dict] = None):
+        if config is None:
+            self._configure(model_config.get())
+            model_config.subscribe(lambda new, old: self._configure(new))
+        else:
+            self._configure(config)
+        self._lock = FileLock(RETRAIN_LOCK_PATH)
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            "checks": 0, "runs": 0, "failures": 0, "skipped_locked": 0,
+            "running": False, "last_trigger": None, "last_run": None, "last_result": None,
+        }
+
+    def _configure(self, config):
+        retrain = config.get('retrain', {}) or {}
+        scheduler = retrain.get('scheduler', {}) or {}
+        self.enabled = bool(scheduler.get('enabled', False))
+        self.check_seconds = float(scheduler.get('check_seconds', 60))
+        self.interval_minutes = float(scheduler.get('interval_minutes', 60))
+        self.timeout_seconds = float(scheduler.get('timeout_seconds', 1800))
+        self.min_new_interactions = int(retrain.get('min_new_interactions', 50))
+
+    def start(self):
+        """Start the scheduler thread (no-op unless retrain.scheduler.enabled)."""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="retrain-scheduler", daemon=True)
+        self._thread.start()
+        print(f"[RetrainScheduler] Checking every {self.check_seconds:g}s "
+              f"(threshold {self.min_new_interactions}, interval {self.interval_minutes:g} min)")
+
+    def notify(self):
+        """Ask for an early check (never blocks the caller)."""
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.check_seconds)
+            self._wake.clear()
+            if not self.enabled:  # switched off by a config edit
+                continue
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[RetrainScheduler] Check error: {e}")
+
+    # ── Triggers ────────────────────────────────────────────────
+
+    def due(self) -> Optional[str]:
+        """Why a retrain is due ("threshold" / "interval"), or None."""
+        new_rows = new_live_interactions(_load_registry())
+        if new_rows >= self.min_new_interactions:
+            return "threshold"
+        if self.interval_minutes > 0 and new_rows > 0:
+            try:
+                age = time.time() - os.path.getmtime(REGISTRY_PATH)
+            except OSError:
+                return "interval"
+            if age >= self.interval_minutes * 60:
+                return "interval"
+        return None
+
+    def check(self) -> bool:
+        """Run a retrain if one is due and no other worker is running one."""
+        self._stats["checks"] += 1
+        trigger = self.due()
+        if trigger is None:
+            return False
+        if not self._lock.acquire(blocking=False):
+            self._stats["skipped_locked"] += 1
+            return False
+        try:
+            ok = self._run(trigger)
+        finally:
+            self._lock.release()
+        if ok:
+            # This worker swaps now; the others follow on their next registry poll
+            from ml.model_service import model_service
+            model_service.check_registry()
+        return ok
+
+    def _run(self, trigger: str) -> bool:
+        self._stats.update(running=True, last_trigger=trigger,
+                           last_run=datetime.now().isoformat(timespec='seconds'))
+        print(f"[RetrainScheduler] Retrain triggered ({trigger})")
+        try:
+            result = subprocess.run(
+                [sys.executable, RETRAIN_SCRIPT, '--force'],
+                cwd=BASE_DIR,
+                env={**os.environ, LOCK_HELD_ENV: '1'},
+                capture_output=True, text=True,
+                timeout=self.timeout_seconds,
+            )
+            ok = result.returncode == 0
+            output = result.stdout if ok else (result.stderr or result.stdout)
+            tail = output.strip().splitlines()[-1:] or [""]
+            self._stats["last_result"] = "ok" if ok else f"exit {result.returncode}: {tail[0]}"
+        except subprocess.TimeoutExpired:
+            ok = False
+            self._stats["last_result"] = f"timeout after {self.timeout_seconds:g}s"
+        finally:
+            self._stats["running"] = False
+
+        self._stats["runs"] += 1
+        if not ok:
+            self._stats["failures"] += 1
+        print(f"[RetrainScheduler] Retrain {self._stats['last_result']}")
+        return ok
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "check_seconds": self.check_seconds,
+            "interval_minutes": self.interval_minutes,
+            **self._stats,
+        }
+
+
+# Singleton
+retrain_scheduler = RetrainScheduler()
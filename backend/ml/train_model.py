@@ -1,6 +1,12 @@
 """
 Training Pipeline for FlavorSense AI
 Loads synthetic interactions, builds features, trains XGBoost, saves model.
+Trains with config.training plus the registry's tune_model.py winners, like
+retrain_if_needed.py.
+
+The model is saved as the next registry version (native .ubj + compiled
+.npz, with checksums and feature schema, see model_store.py) and becomes
+model_registry.json's current model, so any engine can serve it.
 
 Run:
     python backend/ml/train_model.py
@@ -8,8 +14,8 @@ Run:
 import os
 import sys
 import json
-import pickle
-import yaml
+from datetime import datetime
+
 import pandas as pd
 import numpy as np
 from xgboost import XGBRegressor
@@ -19,14 +25,14 @@ from sklearn.metrics import mean_squared_error, r2_score
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, BASE_DIR)
 
-from features.feature_builder import build_features, FEATURE_NAMES
-from data.generate_synthetic_data import SYNTHETIC_USERS
-
-
-def load_config():
-    config_path = os.path.join(BASE_DIR, 'config', 'model_config.yaml')
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+from features.feature_builder import FEATURE_NAMES, RECIPE_FEATURES_PATH
+from services.recipe_catalog import recipe_catalog
+from ml.model_store import save_model_artifacts, next_model_version, write_registry
+from ml.training_data import build_training_matrix, model_params, SYNTHETIC_PROFILES
+from ml.retrain_if_needed import REGISTRY_PATH, MODELS_DIR, load_registry, tuned_training_config
+from ml.retrain_scheduler import RETRAIN_LOCK_PATH
+from utils.file_lock import FileLock
+from utils.model_config import model_config
 
 
 def load_recipes():
@@ -40,48 +46,18 @@ def load_interactions():
     return pd.read_csv(csv_path)
 
 
-def get_user_profile(user_id):
-    """Look up synthetic user profile by ID."""
-    for u in SYNTHETIC_USERS:
-        if u['id'] == user_id:
-            return {
-                'flavor_vector': u['flavor_vec'],
-                'diet_type': u['diet'],
-                'calorie_goal': u['calorie_goal'],
-                'cuisine_preference': u['cuisine'],
-                'daily_budget': u['budget'],
-            }
-    return None
-
-
 def main():
-    config = load_config()
-    training_cfg = config['training']
+    config = model_config.get()
+    training_cfg = tuned_training_config(config, load_registry())
 
     print("[1/5] Loading data...")
     interactions = load_interactions()
     recipes_list = load_recipes()
-    recipes_map = {r['id']: r for r in recipes_list}
 
     print(f"      {len(interactions)} interactions, {len(recipes_list)} recipes")
 
     print("[2/5] Building feature matrix...")
-    X_rows = []
-    y_rows = []
-
-    for _, row in interactions.iterrows():
-        user_profile = get_user_profile(row['user_id'])
-        recipe = recipes_map.get(str(row['recipe_id']))
-
-        if user_profile is None or recipe is None:
-            continue
-
-        features = build_features(user_profile, recipe)
-        X_rows.append(features)
-        y_rows.append(float(row['rating']))
-
-    X = np.array(X_rows)
-    y = np.array(y_rows)
+    X, y = build_training_matrix(interactions, recipes_list, SYNTHETIC_PROFILES)
     print(f"      Feature matrix: {X.shape}, Target: {y.shape}")
 
     print("[3/5] Splitting train/test...")
@@ -94,10 +70,9 @@ def main():
     print("[4/5] Training XGBoost...")
     model = XGBRegressor(
         n_estimators=training_cfg['n_estimators'],
-        max_depth=training_cfg['max_depth'],
-        learning_rate=training_cfg['learning_rate'],
         random_state=training_cfg['random_state'],
-        verbosity=0
+        verbosity=0,
+        **model_params(training_cfg)
     )
     model.fit(X_train, y_train)
 
@@ -115,10 +90,61 @@ def main():
         print(f"        {name:20s} {imp:.3f} {bar}")
 
     print("\n[5/5] Saving model...")
-    model_path = os.path.join(BASE_DIR, 'ml', 'model.pkl')
-    with open(model_path, 'wb') as f:
-        pickle.dump(model, f)
-    print(f"      Saved → {model_path}")
+    table = recipe_catalog.feature_table(ensure=recipes_list)
+    table_path = os.path.join(BASE_DIR, RECIPE_FEATURES_PATH)
+    table.save(table_path)
+    print(f"      Recipe features: {len(table)} rows (catalog {table.catalog_version}) → {table_path}")
+
+    rmse = round(float(rmse), 4)
+    today = datetime.now().strftime('%Y-%m-%d')
+    # Synthetic data only: the live watermark starts at 0, so the next
+    # retrain_if_needed.py run sees every live row as new
+    training_data = {
+        "mode": "full",
+        "base_model": None,
+        "synthetic_rows": len(interactions),
+        "live_rows": [0, 0],
+        "live_watermark": {"rows": 0, "offset": 0},
+        "incremental_since_full": 0,
+        "total_trees": int(model.get_booster().num_boosted_rounds()),
+    }
+
+    # Read-modify-write under the retrain lock, like retrain_if_needed.py
+    with FileLock(RETRAIN_LOCK_PATH):
+        registry = load_registry()
+        history = registry.get('history', [])
+        artifacts = save_model_artifacts(model, MODELS_DIR, next_model_version(MODELS_DIR, registry))
+        model_name = artifacts['current_model']
+        print(f"      Saved → {model_name}, {artifacts['compiled_model']}")
+        history.append({
+            "version": model_name,
+            "trained_on": today,
+            "samples": len(X),
+            "rmse": rmse,
+            "compiled_model": artifacts['compiled_model'],
+            "checksums": artifacts['checksums'],
+            "catalog_version": table.catalog_version,
+            "training_data": training_data,
+        })
+        updated = {
+            **artifacts,
+            "trained_on": today,
+            "samples": len(X),
+            "rmse": rmse,
+            "features_used": len(FEATURE_NAMES),
+            "recipe_features": {
+                "path": RECIPE_FEATURES_PATH,
+                "catalog_version": table.catalog_version,
+                "rows": len(table),
+                "feature_names": FEATURE_NAMES,
+            },
+            "training_data": training_data,
+            "history": history,
+        }
+        if 'tuning' in registry:
+            updated['tuning'] = registry['tuning']
+        write_registry(updated, REGISTRY_PATH)
+    print(f"      Registry updated → {model_name}")
     print("\nTraining complete.")
 
 
@@ -0,0 +1,83 @@
+"""
+Training Data Builder for FlavorSense AI
+Turns an interactions DataFrame (user_id, recipe_id, rating) into the
+(X, y) training matrix without a per-row Python loop.
+
+Interactions are joined to the user table and the recipe feature table by
+hash lookups (pandas Index.get_indexer), and X is computed by the serving
+code path itself — RecipeFeatureTable.features_for_users() over
+compute_feature_matrix() — so training and serving features cannot drift.
+"""
+import os
+import sys
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from services.recipe_catalog import recipe_catalog
+from data.generate_synthetic_data import SYNTHETIC_USERS
+
+
+def _synthetic_profile(user: dict) -> dict:
+    return {
+        'flavor_vector': user['flavor_vec'],
+        'diet_type': user['diet'],
+        'calorie_goal': user['calorie_goal'],
+        'cuisine_preference': user['cuisine'],
+        'daily_budget': user['budget'],
+    }
+
+
+# user_id → ranking profile for the synthetic training users
+SYNTHETIC_PROFILES: Dict[str, dict] = {u['id']: _synthetic_profile(u) for u in SYNTHETIC_USERS}
+
+# Profile assumed for live users without a synthetic profile (retraining)
+GENERIC_PROFILE = {
+    'flavor_vector': [0.5] * 5,
+    'diet_type': 'non-veg',
+    'calorie_goal': 2000,
+    'cuisine_preference': '',
+    'daily_budget': 30,
+}
+
+
+# `training:` keys that configure the split, not the XGBRegressor itself
+SPLIT_KEYS = ('test_size', 'random_state', 'n_estimators')
+
+
+def model_params(training_cfg: dict) -> dict:
+    """XGBRegressor keyword arguments from a `training:` config (tuned or not)."""
+    return {k: v for k, v in training_cfg.items() if k not in SPLIT_KEYS}
+
+
+def build_training_matrix(interactions: pd.DataFrame, recipes: list,
+                          profiles: Dict[str, dict] = SYNTHETIC_PROFILES,
+                          default_profile: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Feature matrix X (N, 7) and ratings y (N,) for the interactions whose
+    recipe is in `recipes` and whose user is in `profiles` (users not in
+    `profiles` get `default_profile`, or are dropped when it is None).
+    Row order follows the interactions.
+    """
+    recipe_ids = pd.Index(list(dict.fromkeys(str(r['id']) for r in recipes)))
+    user_ids = pd.Index(list(profiles.keys()))
+    user_profiles = list(profiles.values())
+    if default_profile is not None:
+        user_profiles.append(default_profile)
+
+    # Hash joins: interaction → recipe position / user position (-1 = no match)
+    recipe_pos = recipe_ids.get_indexer(interactions['recipe_id'].astype(str))
+    user_pos = user_ids.get_indexer(interactions['user_id'].astype(str))
+    if default_profile is not None:
+        user_pos = np.where(user_pos < 0, len(user_profiles) - 1, user_pos)
+    keep = (recipe_pos >= 0) & (user_pos >= 0)
+
+    table = recipe_catalog.feature_table(ensure=recipes)
+    table_rows = table.rows_for(recipe_ids)
+    X = table.features_for_users(user_profiles, user_pos[keep], table_rows[recipe_pos[keep]])
+    y = interactions['rating'].to_numpy(dtype=float)[keep]
+    return X, y
@@ -0,0 +1,173 @@
+"""
+Hyperparameter Tuning for FlavorSense AI
+Grid (or seeded random subset) search over the `tuning:` config section.
+
+Each trial trains an XGBRegressor with early stopping on a validation split
+carved from the training rows; the held-out test split (training.test_size)
+only scores the winner. Trials run in a process pool — one single-threaded
+trial per core, with the training matrices sent once per worker — and the
+whole search is deterministic under training.random_state.
+
+The winning parameters, their quality and the search cost are written to
+model_registry.json under "tuning"; retrain_if_needed.py trains with them
+from then on.
+
+Run:
+    python backend/ml/tune_model.py
+"""
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from xgboost import XGBRegressor
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_squared_error
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ml.training_data import build_training_matrix, SYNTHETIC_PROFILES, GENERIC_PROFILE
+from ml.retrain_scheduler import RETRAIN_LOCK_PATH
+from ml.model_store import write_registry
+from utils.file_lock import FileLock
+from utils.model_config import model_config
+
+REGISTRY_PATH = os.path.join(BASE_DIR, 'ml', 'model_registry.json')
+
+# Worker-process state: the split matrices, set once by _init_worker
+_data = {}
+
+
+def search_space(tuning_cfg: dict, random_state: int) -> list:
+    """Parameter dicts to try, in a fixed order (max_trials > 0: seeded subset)."""
+    space = tuning_cfg.get('search_space', {})
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    max_trials = int(tuning_cfg.get('max_trials', 0) or 0)
+    if 0 < max_trials < len(grid):
+        picks = np.random.default_rng(random_state).choice(len(grid), size=max_trials, replace=False)
+        grid = [grid[i] for i in sorted(picks)]
+    return grid
+
+
+def _init_worker(X_train, y_train, X_val, y_val):
+    _data.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+
+
+def fit_trial(params: dict, max_estimators: int, early_stopping_rounds: int, random_state: int):
+    """Train one candidate with early stopping; returns (model, validation RMSE)."""
+    model = XGBRegressor(
+        n_estimators=max_estimators,
+        early_stopping_rounds=early_stopping_rounds,
+        eval_metric='rmse',
+        random_state=random_state,
+        n_jobs=1,  # parallelism comes from the process pool
+        verbosity=0,
+        **params
+    )
+    model.fit(_data['X_train'], _data['y_train'], eval_set=[(_data['X_val'], _data['y_val'])], verbose=False)
+    val_rmse = float(np.sqrt(mean_squared_error(_data['y_val'], model.predict(_data['X_val']))))
+    return model, val_rmse
+
+
+def run_trial(args) -> dict:
+    index, params, max_estimators, early_stopping_rounds, random_state = args
+    start = time.perf_counter()
+    model, val_rmse = fit_trial(params, max_estimators, early_stopping_rounds, random_state)
+    return {
+        "trial": index,
+        "params": params,
+        "val_rmse": round(val_rmse, 4),
+        "best_iteration": int(model.best_iteration),
+        "fit_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def main():
+    config = model_config.get()
+    training_cfg = config['training']
+    tuning_cfg = config.get('tuning', {}) or {}
+    random_state = training_cfg['random_state']
+    max_estimators = int(tuning_cfg.get('max_estimators', 500))
+    early_stopping_rounds = int(tuning_cfg.get('early_stopping_rounds', 20))
+
+    print("[Tune] Loading data...")
+    from ml.retrain_if_needed import load_recipes, load_all_interactions
+    interactions, _, _, _ = load_all_interactions()
+    X, y = build_training_matrix(interactions, load_recipes(), SYNTHETIC_PROFILES,
+                                 default_profile=GENERIC_PROFILE)
+
+    # train / validation (early stopping, model selection) / test (final score only)
+    X_rest, X_test, y_rest, y_test = train_test_split(
+        X, y, test_size=training_cfg['test_size'], random_state=random_state
+    )
+    X_train, X_val, y_train, y_val = train_test_split(
+        X_rest, y_rest, test_size=tuning_cfg.get('validation_size', 0.2), random_state=random_state
+    )
+    print(f"[Tune] Rows: {len(X_train)} train / {len(X_val)} validation / {len(X_test)} test")
+
+    trials = search_space(tuning_cfg, random_state)
+    workers = int(tuning_cfg.get('workers', 0) or 0) or os.cpu_count() or 1
+    workers = max(1, min(workers, len(trials)))
+    print(f"[Tune] {len(trials)} trials on {workers} worker(s), "
+          f"≤{max_estimators} trees, early stopping after {early_stopping_rounds}")
+
+    start = time.perf_counter()
+    tasks = [(i, params, max_estimators, early_stopping_rounds, random_state) for i, params in enumerate(trials)]
+    # spawn: workers start clean instead of forking the caller's threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(X_train, y_train, X_val, y_val)) as pool:
+        results = list(pool.map(run_trial, tasks))
+    search_seconds = round(time.perf_counter() - start, 2)
+
+    # Ties go to the earlier trial, so the winner does not depend on scheduling
+    results.sort(key=lambda r: (r['val_rmse'], r['trial']))
+    print("\n      val_rmse  trees  fit_s   params")
+    for r in results:
+        print(f"      {r['val_rmse']:.4f}  {r['best_iteration'] + 1:5d}  {r['fit_seconds']:5.2f}   {r['params']}")
+    best = results[0]
+
+    # Refit the winner (same seed → same model) and score it once on the test split
+    _init_worker(X_train, y_train, X_val, y_val)
+    model, _ = fit_trial(best['params'], max_estimators, early_stopping_rounds, random_state)
+    test_rmse = round(float(np.sqrt(mean_squared_error(y_test, model.predict(X_test)))), 4)
+    n_estimators = best['best_iteration'] + 1
+    print(f"\n[Tune] Best: {best['params']} with {n_estimators} trees — "
+          f"val RMSE {best['val_rmse']}, test RMSE {test_rmse} ({search_seconds}s search)")
+
+    tuning = {
+        "tuned_on": datetime.now().strftime('%Y-%m-%d'),
+        "params": {**best['params'], "n_estimators": n_estimators},
+        "val_rmse": best['val_rmse'],
+        "test_rmse": test_rmse,
+        "samples": len(X),
+        "trials": len(trials),
+        "workers": workers,
+        "search_seconds": search_seconds,
+        "trial_fit_seconds": round(sum(r['fit_seconds'] for r in results), 2),
+        "winner_fit_seconds": best['fit_seconds'],
+        "max_estimators": max_estimators,
+        "early_stopping_rounds": early_stopping_rounds,
+        "random_state": random_state,
+    }
+
+    # Read-modify-write under the retrain lock so a concurrent retrain is not lost
+    with FileLock(RETRAIN_LOCK_PATH):
+        try:
+            with open(REGISTRY_PATH, 'r') as f:
+                registry = json.load(f)
+        except Exception:
+            registry = {"current_model": None, "history": []}
+        registry['tuning'] = tuning
+        write_registry(registry, REGISTRY_PATH)
+    print("[Tune] Registry updated — retrain_if_needed.py and train_model.py now train with these parameters")
+
+
+if __name__ == '__main__':
+    main()
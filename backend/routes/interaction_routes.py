@@ -2,52 +2,29 @@
 Interaction Routes for FlavorSense AI
 Records user-recipe interactions and updates user profiles in real-time.
 """
-import os
-import csv
-import json
 from flask import Blueprint, request, jsonify
-import yaml
-import numpy as np
 
-interaction_bp = Blueprint('interaction', __name__)
-
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+from utils.model_config import model_config
 
-
-def _load_config():
-    config_path = os.path.join(BASE_DIR, 'config', 'model_config.yaml')
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+interaction_bp = Blueprint('interaction', __name__)
 
 
 def _get_recipe_flavor(recipe_id):
-    """Look up recipe and compute its flavor vector."""
-    from services.flavor_service import flavor_service
+    """Look up recipe and return its precomputed flavor vector."""
+    from services.recipe_index import recipe_index
 
-    # Try recipe cache first
-    cache_path = os.path.join(BASE_DIR, 'data', 'recipes_cache.json')
-    try:
-        with open(cache_path, 'r') as f:
-            recipes = json.load(f)
-        for r in recipes:
-            if str(r.get('id')) == str(recipe_id):
-                total = np.zeros(5)
-                for ing in r.get('ingredients', []):
-                    total += flavor_service.get_flavor_vector(ing)
-                norm = np.linalg.norm(total)
-                return (total / norm).tolist() if norm > 0 else total.tolist()
-    except Exception:
-        pass
-
-    # Try RecipeService (API or mock)
+    # RecipeIndex: recipes_cache.json + every recipe ingested so far
+    flavor = recipe_index.get_flavor(recipe_id)
+    if flavor is not None:
+        return flavor.tolist()
+
+    # Unknown id: try RecipeService (API or mock), which adds it to the index
     from services.recipe_service import recipe_service
     recipe = recipe_service.get_recipe_by_id(recipe_id)
     if recipe:
-        total = np.zeros(5)
-        for ing in recipe.ingredients:
-            total += flavor_service.get_flavor_vector(ing)
-        norm = np.linalg.norm(total)
-        return (total / norm).tolist() if norm > 0 else total.tolist()
+        flavor = recipe_index.get_flavor(recipe.id)
+        if flavor is not None:
+            return flavor.tolist()
 
     return [0] * 5
 
@@ -76,7 +53,7 @@ def record_interaction():
             return jsonify({"error": "user_id and recipe_id required"}), 400
 
         # Validate action
-        config = _load_config()
+        config = model_config.get()
         action_weights = config['action_weights']
         valid_actions = list(action_weights.keys())
         if action not in valid_actions:
@@ -84,20 +61,16 @@ def record_interaction():
 
         weight = action_weights[action]
 
-        # 1. Append to live interactions CSV
-        csv_path = os.path.join(BASE_DIR, 'data', 'user_interactions_live.csv')
-        file_exists = os.path.exists(csv_path)
-
-        with open(csv_path, 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=['user_id', 'recipe_id', 'action', 'rating'])
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow({
-                'user_id': user_id,
-                'recipe_id': str(recipe_id),
-                'action': action,
-                'rating': round(weight, 4)
-            })
+        # 1. Append to live interactions CSV (group-committed by the writer
+        #    thread; only interaction_log.wait_actions wait for the write)
+        from services.interaction_log import interaction_logger, LIVE_PATH as csv_path
+        wait_actions = config.get('interaction_log', {}).get('wait_actions', ['like', 'save', 'dislike'])
+        interaction_logger.log({
+            'user_id': user_id,
+            'recipe_id': str(recipe_id),
+            'action': action,
+            'rating': round(weight, 4)
+        }, wait=action in wait_actions)
 
         # 2. Update user profile if like or save
         if action in ('like', 'save'):
@@ -119,11 +92,14 @@ def record_interaction():
             flavor_updated = False
             updated_profile = None
 
-        # 3. Count live interactions for retrain signal
-        live_count = 0
-        if os.path.exists(csv_path):
-            with open(csv_path, 'r') as f:
-                live_count = sum(1 for _ in f) - 1  # minus header
+        # 3. Count live interactions for retrain signal (O(1) manifest read)
+        from ml.live_data import count_live_interactions
+        live_count = count_live_interactions(csv_path)
+
+        # Rows the serving model has not been trained on yet (retrain watermark)
+        from ml.model_service import model_service
+        watermark = model_service.registry.get('training_data', {}).get('live_watermark', {})
+        new_count = max(0, live_count - watermark.get('rows', 0))
 
         response = {
             "status": "recorded",
@@ -132,7 +108,8 @@ def record_interaction():
             "action": action,
             "weight": weight,
             "flavor_updated": flavor_updated,
-            "live_interactions_total": live_count
+            "live_interactions_total": live_count,
+            "live_interactions_new": new_count
         }
 
         if flavor_updated and updated_profile:
@@ -140,8 +117,10 @@ def record_interaction():
 
         # Retrain hint
         retrain_threshold = config.get('retrain', {}).get('min_new_interactions', 50)
-        if live_count >= retrain_threshold:
+        if new_count >= retrain_threshold:
             response["retrain_recommended"] = True
+            from ml.retrain_scheduler import retrain_scheduler
+            retrain_scheduler.notify()
 
         return jsonify(response), 200
 
@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify
-from services.recipe_service import recipe_service
+import json
+import time
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from services.user_service import user_service
+from services.recommendation_pipeline import recommendation_pipeline, PipelineRequest
+from services.recommendation_cache import recommendation_cache
+from services.recipe_catalog import recipe_catalog
 from ml.model_service import model_service
 import numpy as np
 
@@ -17,13 +21,18 @@ def recommend():
         "cuisine_preference": "indian",
         "calorie_goal": 2000,
         "daily_budget": 25,
-        "allergies": []
+        "allergies": [],
+        "explain": false,           (optional: per-feature contributions)
+        "deadline_ms": 100          (optional: overrides model.deadline_ms)
     }
 
     Flow:
-        user_service.build_profile()
-        → recipe_service.get_candidates()
-        → model_service.rank_recipes()  (with confidence + explanation)
+        recommendation_cache lookup (user, request body, model, catalog version)
+        → user_service.build_profile()
+        → recommendation_pipeline.run()
+            retrieve → filter (allergens) → prescore (nearest neighbours, top
+            pipeline.prescore_k) → rank (model_service, with confidence;
+            explanation if requested) → rerank
         → return top results with metadata
     """
     try:
@@ -31,47 +40,35 @@ def recommend():
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
+        deadline_ms = data.get('deadline_ms')
+        if deadline_ms is not None:
+            try:
+                if isinstance(deadline_ms, bool):
+                    raise TypeError
+                deadline_ms = float(deadline_ms)
+            except (TypeError, ValueError):
+                return jsonify({"error": "deadline_ms must be a number of milliseconds"}), 400
+            if not 0 <= deadline_ms < float('inf'):
+                return jsonify({"error": "deadline_ms must be a non-negative finite number"}), 400
+
+        # 0. Materialized response for an unchanged user, model and catalog
+        user_id = data.get('user_id', data.get('id', 'guest'))
+        cache_key = recommendation_cache.make_key(user_id, data, model_service.model_key, recipe_catalog.version)
+        cached = recommendation_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(dict(cached, cached=True)), 200
+
         # 1. Build user profile (merges history + request)
         profile = user_service.build_profile_for_ranking(data)
 
-        # 2. Fetch candidate recipes
-        diet = data.get('diet_type', '')
-        if diet and recipe_service.is_live:
-            candidates_raw = recipe_service.filter_by_diet(diet, limit=20)
-        else:
-            candidates_raw = recipe_service.get_all_recipes()
-
-        # Convert Recipe objects to dicts for the feature builder
-        candidates = []
-        for r in candidates_raw:
-            d = r.to_dict()
-            d.setdefault('cuisine', '')
-            d.setdefault('price', d.get('price_approx', 0))
-            d.setdefault('nutrition', d.get('nutrition_info', {}))
-            d.setdefault('tags', d.get('diet_tags', []))
-            candidates.append(d)
-
-        # 3. Hard constraint: remove allergens
-        allergies = profile.get('allergies', [])
-        if allergies:
-            filtered = []
-            for recipe in candidates:
-                has_allergen = False
-                for allergen in allergies:
-                    for ing in recipe.get('ingredients', []):
-                        if allergen.lower() in ing.lower():
-                            has_allergen = True
-                            break
-                    if has_allergen:
-                        break
-                if not has_allergen:
-                    filtered.append(recipe)
-            candidates = filtered
-
-        # 4. Rank via ML model (or cosine fallback) — now returns dict with metadata
-        result = model_service.rank_recipes(profile, candidates)
-        ranked = result['ranked']
-        metadata = result['metadata']
+        # 2-6. Retrieve → filter → prescore → rank → rerank
+        result = recommendation_pipeline.run(PipelineRequest(
+            profile=profile,
+            explain=bool(data.get('explain', False)),
+            deadline_ms=deadline_ms,
+        ))
+        ranked = result.ranked
+        metadata = result.metadata
 
         # Format results with score, confidence, explanation
         results = []
@@ -79,17 +76,85 @@ def recommend():
             score, recipe, explanation, confidence = item
             recipe['relevance_score'] = round(float(score), 4)
             recipe['confidence'] = confidence
-            recipe['explanation'] = explanation
+            if explanation is not None:
+                recipe['explanation'] = explanation
             results.append(recipe)
 
-        return jsonify({
+        payload = {
             "ranking_source": metadata.get("ranking_source", "unknown"),
             "model_version": metadata.get("model_version", "none"),
             "features_used": metadata.get("features_used", 0),
             "recommendation_time_ms": metadata.get("recommendation_time_ms", 0),
+            "pipeline": result.stages,
             "count": len(results),
             "results": results
-        }), 200
+        }
+        # Deadline fallbacks are transient; let the next call try the model again.
+        # Re-keyed: ranking may have upserted its candidates (new catalog version)
+        if payload["ranking_source"] != "cosine_fallback_deadline":
+            cache_key = recommendation_cache.make_key(user_id, data, model_service.model_key, recipe_catalog.version)
+            recommendation_cache.set(cache_key, payload)
+        return jsonify(dict(payload, cached=False)), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@recommendation_bp.route('/recommend/batch', methods=['POST'])
+def recommend_batch():
+    """
+    POST /api/recommend/batch
+    Body: {
+        "users": ["u1", {"user_id": "u2", "flavor_preference_vector": [...], ...}],
+        "top_n": 5                  (optional)
+    }
+    Each user is an id of a known profile or a profile as posted to /api/recommend.
+
+    Streams NDJSON: one line per user in input order
+        {"user_id", "ranking_source", "model_version", "count", "results"}
+    (or {"user_id", "error"}), then a final {"summary": {...}} line.
+    Offline jobs can call recommendation_pipeline.run_batch() directly.
+    """
+    data = request.json
+    users = (data or {}).get('users')
+    if not isinstance(users, list) or not users:
+        return jsonify({"error": "users must be a non-empty list"}), 400
+    top_n = data.get('top_n')
+
+    def generate():
+        start = time.time()
+        count = errors = 0
+        try:
+            for entry in recommendation_pipeline.run_batch(users, top_n=top_n):
+                count += 1
+                errors += "error" in entry
+                yield json.dumps(entry) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+        yield json.dumps({"summary": {
+            "users": count,
+            "errors": errors,
+            "time_ms": round((time.time() - start) * 1000, 1),
+        }}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@recommendation_bp.route('/recommend/cache', methods=['GET'])
+def recommend_cache_stats():
+    """
+    GET /api/recommend/cache
+    Recommendation cache size, hit rate, expirations and invalidations.
+    """
+    return jsonify(recommendation_cache.get_stats()), 200
+
+@recommendation_bp.route('/model', methods=['GET'])
+def model_info():
+    """
+    GET /api/model
+    Which model version this worker is serving (and its rollback target),
+    plus the background retrain scheduler's state.
+    """
+    from ml.retrain_scheduler import retrain_scheduler
+    info = model_service.get_serving_info()
+    info["retrain_scheduler"] = retrain_scheduler.get_stats()
+    return jsonify(info), 200
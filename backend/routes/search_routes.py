@@ -43,10 +43,9 @@ def get_recipe(recipe_id):
         if recipe is None:
             return jsonify({"error": f"Recipe {recipe_id} not found"}), 404
 
-        # Compute flavor profile for the returned recipe
-        from services.flavor_service import flavor_service
-        from services.recommendation_engine import recommendation_engine
-        recipe.flavor_profile = recommendation_engine._calculate_recipe_flavor(recipe.ingredients)
+        # Flavor profile is precomputed when the recipe is ingested
+        from services.recipe_flavor_store import recipe_flavor_store
+        recipe.flavor_profile = recipe_flavor_store.get(recipe.id, recipe.ingredients)
 
         return jsonify(recipe.to_dict()), 200
 
@@ -188,8 +188,8 @@ class CommunityService:
 
         # 1. Flavor vector — average of all ingredient vectors via FlavorService
         if ingredient_names:
-            vectors = [flavor_service.get_flavor_vector(name) for name in ingredient_names]
-            recipe.flavor_profile = np.mean(vectors, axis=0)
+            vectors = flavor_service.get_flavor_vectors(ingredient_names)
+            recipe.flavor_profile = vectors.mean(axis=0, dtype=float)
         else:
             recipe.flavor_profile = np.zeros(5)
 
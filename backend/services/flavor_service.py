@@ -8,20 +8,44 @@ Priority pipeline:
     -- Future: External Flavor API layer can be inserted at priority 2.5 --
 
 Vector dimensions: 5 → [sweet, spicy, sour, bitter, umami]
+
+Storage: every resolved vector (dataset + synthetic) lives in one contiguous
+float32 matrix; ``_index`` maps ingredient → row so whole ingredient lists
+resolve with a single fancy-index gather. Dataset rows are pinned; synthetic
+rows sit behind a size-bounded LRU (``cache.flavor_cache_size``) and are
+recycled on eviction.
+
+``dataset_version`` (a content hash of flavor_vectors.json) changes whenever
+the dataset is reloaded, so downstream caches of derived vectors can tell
+when they are stale.
 """
 
 import hashlib
 import json
 import os
-from typing import Dict, Optional
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
 
 import numpy as np
 
+from utils.cache import LRUCache
+from utils.model_config import model_config
+
 # Constants
 VECTOR_DIM = 5
 FLAVOR_LABELS = ['sweet', 'spicy', 'sour', 'bitter', 'umami']
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(BASE_DIR, 'data', 'flavor_vectors.json')
+MATRIX_DTYPE = np.float32
+ZERO_ROW = 0  # Row 0 is reserved for empty ingredient names
+DEFAULT_CACHE_SIZE = 10000
+DATASET_CHECK_INTERVAL = 5.0  # seconds between flavor_vectors.json mtime checks
+
+
+def _load_cache_size() -> int:
+    """The synthetic-vector cache bound from model_config.yaml."""
+    return int(model_config.get().value('cache', 'flavor_cache_size', DEFAULT_CACHE_SIZE))
 
 
 class FlavorService:
@@ -32,22 +56,38 @@ class FlavorService:
         cache → local dataset → synthetic fallback → cache store
     """
 
-    def __init__(self):
-        self._cache: Dict[str, np.ndarray] = {}
+    def __init__(self, max_cache_size: Optional[int] = None):
+        self._index: Dict[str, int] = {}
+        self._matrix = np.zeros((1, VECTOR_DIM), dtype=MATRIX_DTYPE)
+        self._rows = 1
+        self._synthetic = LRUCache(max_size=_load_cache_size() if max_cache_size is None else max_cache_size)
         self._dataset: Dict[str, list] = {}
         self._dataset_hits = 0
+        self._dataset_cache_hits = 0
+        self._dataset_seen: Set[str] = set()
         self._synthetic_hits = 0
+        self.dataset_version: Optional[str] = None
+        self._dataset_mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
         self._load_dataset()
+        if max_cache_size is None:
+            model_config.subscribe(self._on_config_change)
 
     # ── Layer 0: Dataset Loading ────────────────────────────────
 
     def _load_dataset(self):
         """Load flavor vectors from local JSON file at startup."""
         try:
-            with open(DATA_PATH, 'r') as f:
-                raw = json.load(f)
+            mtime = os.path.getmtime(DATA_PATH)
+            with open(DATA_PATH, 'rb') as f:
+                content = f.read()
+            raw = json.loads(content)
             # Normalize keys to lowercase
             self._dataset = {k.lower().strip(): v for k, v in raw.items()}
+            self._build_matrix()
+            self._dataset_mtime = mtime
+            self.dataset_version = hashlib.sha256(content).hexdigest()[:12]
             print(f"[FlavorService] Dataset loaded: {len(self._dataset)} ingredients from {DATA_PATH}")
         except FileNotFoundError:
             print(f"[FlavorService] WARNING: Dataset not found at {DATA_PATH}")
@@ -56,23 +96,87 @@ class FlavorService:
         except Exception as e:
             print(f"[FlavorService] WARNING: Failed to load dataset: {e}")
 
-    # ── Layer 1: Cache ──────────────────────────────────────────
+    def _build_matrix(self):
+        """Pack the dataset into rows 1..N of the flavor matrix."""
+        keys = list(self._dataset.keys())
+        matrix = np.zeros((len(keys) + 1, VECTOR_DIM), dtype=MATRIX_DTYPE)
+        if keys:
+            matrix[1:] = np.asarray([self._dataset[k] for k in keys], dtype=MATRIX_DTYPE)
+        self._matrix = matrix
+        self._rows = len(keys) + 1
+        self._index = {k: i + 1 for i, k in enumerate(keys)}
+        self._dataset_seen.clear()
+        self._synthetic.clear()
 
-    def _cache_get(self, key: str) -> Optional[np.ndarray]:
-        return self._cache.get(key)
+    def reload_dataset(self):
+        """Re-read flavor_vectors.json and rebuild the flavor matrix."""
+        with self._lock:
+            self._load_dataset()
 
-    def _cache_set(self, key: str, vector: np.ndarray):
-        self._cache[key] = vector
+    def refresh_if_modified(self) -> bool:
+        """
+        Reloads the dataset if flavor_vectors.json changed on disk.
+        The mtime check is throttled to once per DATASET_CHECK_INTERVAL.
+        Returns True if a reload happened.
+        """
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + DATASET_CHECK_INTERVAL
+        try:
+            mtime = os.path.getmtime(DATA_PATH)
+        except OSError:
+            return False
+        if mtime == self._dataset_mtime:
+            return False
+        self.reload_dataset()
+        return True
 
-    # ── Layer 2: Local Dataset Lookup ───────────────────────────
+    def _on_config_change(self, new, old):
+        size = int(new.value('cache', 'flavor_cache_size', DEFAULT_CACHE_SIZE))
+        if size != self._synthetic.max_size:
+            self.resize_cache(size)
 
-    def _lookup_dataset(self, ingredient: str) -> Optional[np.ndarray]:
-        """Exact-match lookup against the loaded flavor_vectors.json."""
-        raw = self._dataset.get(ingredient)
-        if raw is not None:
-            self._dataset_hits += 1
-            return np.array(raw, dtype=float)
-        return None
+    def resize_cache(self, max_size: int):
+        """Re-bound the synthetic cache (cache.flavor_cache_size edited live)."""
+        with self._lock:
+            if self._synthetic.resize(max_size):
+                self._repack_synthetic()
+        print(f"[FlavorService] Synthetic cache bound set to {self._synthetic.max_size}")
+
+    # ── Layer 1: Cache (bounded synthetic rows) ─────────────────
+
+    def _append_row(self) -> int:
+        """Claim the next free row, growing the matrix by doubling."""
+        if self._rows == self._matrix.shape[0]:
+            grown = np.zeros((self._matrix.shape[0] * 2, VECTOR_DIM), dtype=MATRIX_DTYPE)
+            grown[:self._rows] = self._matrix[:self._rows]
+            self._matrix = grown
+        row = self._rows
+        self._rows += 1
+        return row
+
+    def _repack_synthetic(self):
+        """Compact surviving synthetic rows directly after the dataset rows (LRU order kept)."""
+        items = self._synthetic.items()
+        base = len(self._index) + 1
+        matrix = np.zeros((base + len(items), VECTOR_DIM), dtype=MATRIX_DTYPE)
+        matrix[:base] = self._matrix[:base]
+        if items:
+            matrix[base:] = self._matrix[[row for _, row in items]]
+        self._matrix = matrix
+        self._rows = base + len(items)
+        for offset, (key, _) in enumerate(items):
+            self._synthetic.set(key, base + offset)
+
+    def _cache_set(self, key: str, vector: np.ndarray):
+        """Store a synthetic vector, recycling the LRU entry's row when full."""
+        if self._synthetic.is_full():
+            _, row = self._synthetic.pop_oldest()
+        else:
+            row = self._append_row()
+        self._matrix[row] = vector
+        self._synthetic.set(key, row)
 
     # ── Layer 3: Synthetic Fallback (Deterministic) ─────────────
 
@@ -100,33 +204,59 @@ class FlavorService:
         Returns a 5-D flavor vector for the given ingredient.
 
         Pipeline: cache → dataset → synthetic → cache store
+        Returns a float64 copy (the float32 matrix stays internal).
         """
-        key = ingredient.lower().strip()
-        if not key:
-            return np.zeros(VECTOR_DIM)
-
-        # 1. Cache hit
-        cached = self._cache_get(key)
-        if cached is not None:
-            return cached
+        return self.get_flavor_vectors([ingredient])[0].astype(float)
 
-        # 2. Dataset lookup
-        vector = self._lookup_dataset(key)
+    def get_flavor_vectors(self, ingredients: Iterable[str]) -> np.ndarray:
+        """
+        Returns an (n, 5) float32 matrix of flavor vectors, one row per ingredient.
 
-        # 3. Synthetic fallback
-        if vector is None:
-            vector = self._generate_synthetic(key)
-            self._synthetic_hits += 1
+        Known ingredients are gathered from the flavor matrix in one fancy-index
+        operation; unseen ones go through the synthetic fallback afterwards, so
+        rows recycled by eviction during this call never leak into the result.
+        """
+        keys = [ing.lower().strip() for ing in ingredients]
+        rows: List[int] = []
+        misses: Dict[str, List[int]] = {}
+        with self._lock:
+            for pos, key in enumerate(keys):
+                row = ZERO_ROW
+                if key:
+                    row = self._index.get(key)
+                    if row is not None:
+                        # dataset_hits counts first resolutions, as before the
+                        # flavor matrix; repeats are cache hits
+                        if key in self._dataset_seen:
+                            self._dataset_cache_hits += 1
+                        else:
+                            self._dataset_seen.add(key)
+                            self._dataset_hits += 1
+                    else:
+                        row = self._synthetic.get(key)
+                        if row is None:
+                            misses.setdefault(key, []).append(pos)
+                            row = ZERO_ROW
+                rows.append(row)
 
-        # Store in cache for future lookups
-        self._cache_set(key, vector)
-        return vector
+            vectors = self._matrix[rows]
+            for key, positions in misses.items():
+                vector = self._generate_synthetic(key)
+                self._synthetic_hits += 1
+                self._cache_set(key, vector)
+                vectors[positions] = vector
+            return vectors
 
     def get_stats(self) -> dict:
         """Returns service statistics for observability."""
         return {
             "dataset_size": len(self._dataset),
-            "cache_size": len(self._cache),
+            "dataset_version": self.dataset_version,
+            "cache_size": len(self._synthetic),
+            "cache_capacity": self._synthetic.max_size,
+            "cache_hits": self._dataset_cache_hits + self._synthetic.hits,
+            "cache_misses": self._synthetic_hits,
+            "cache_evictions": self._synthetic.evictions,
             "dataset_hits": self._dataset_hits,
             "synthetic_hits": self._synthetic_hits,
         }
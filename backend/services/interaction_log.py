@@ -0,0 +1,210 @@
+"""
+Interaction Log for FlavorSense AI
+Buffered, group-committed writer for data/user_interactions_live.csv.
+
+Request threads enqueue rows and return; a background writer thread
+collects them for up to flush_interval_ms (or max_batch rows) and appends
+each batch with a single write() under an flock() on the CSV's lock file,
+so rows from several gunicorn workers never interleave mid-line. Each
+commit also advances the row-count manifest (see ml/live_data.py).
+
+    interaction_logger.log(row)               # fire-and-forget (e.g. view)
+    interaction_logger.log(row, wait=True)    # returns once the row is written
+
+fsync policy (interaction_log.fsync):
+    always    fsync every batch before waiters are released
+    interval  fsync at most every fsync_interval_seconds; a trailing batch
+              is synced once the interval passes even if no more rows come
+    never     leave it to the OS
+
+Settings follow live edits of model_config.yaml (from the next batch on).
+"""
+import atexit
+import csv
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from ml.live_data import LIVE_PATH, record_append
+from utils.file_lock import FileLock
+from utils.model_config import model_config
+
+FIELDNAMES = ['user_id', 'recipe_id', 'action', 'rating']
+MAX_BACKLOG_BATCHES = 10  # failed batches kept for retry before rows are dropped
+
+
+class InteractionLogger:
+    """In-memory queue + writer thread that group-commits CSV rows."""
+
+    def __init__(self, path: str = LIVE_PATH, config: Optional[dict] = None):
+        self.path = path
+        if config is None:
+            self._configure(model_config.get().section('interaction_log'))
+            model_config.subscribe(lambda new, old: self._configure(new.section('interaction_log')))
+        else:
+            self._configure(config)
+        self._file_lock = FileLock(path + '.lock')
+        self._queue: "queue.Queue[Tuple[dict, Optional[Future]]]" = queue.Queue()
+        self._backlog: List[Tuple[dict, Optional[Future]]] = []
+        self._last_fsync = 0.0
+        self._unsynced = False  # written but not yet fsynced (interval mode)
+        self._stats = {"rows": 0, "batches": 0, "fsyncs": 0, "errors": 0, "dropped": 0}
+        self._worker = threading.Thread(target=self._run, name="interaction-log-writer", daemon=True)
+        self._worker.start()
+        atexit.register(self.flush)
+
+    def _configure(self, config):
+        self.flush_interval = float(config.get('flush_interval_ms', 50)) / 1000.0
+        self.max_batch = max(1, int(config.get('max_batch', 1000)))
+        self.fsync = config.get('fsync', 'interval')
+        self.fsync_interval = float(config.get('fsync_interval_seconds', 1.0))
+
+    def log(self, row: dict, wait: bool = False):
+        """Queue one row; with wait=True block until its batch is on disk."""
+        future = Future() if wait else None
+        self._queue.put((row, future))
+        if future is not None:
+            future.result()
+
+    def flush(self, timeout: float = 5.0):
+        """Block until every row queued so far is written and fsynced (used at exit)."""
+        future = Future()
+        self._queue.put((None, future))
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            print(f"[InteractionLog] Flush incomplete: {e}")
+
+    # ── Writer ──────────────────────────────────────────────────
+
+    def _collect(self) -> List[Tuple[dict, Optional[Future]]]:
+        """
+        One blocking get, then more until flush_interval, max_batch or a waiter.
+        Returns [] when unsynced data is due for an fsync before a row arrives.
+        """
+        timeout = None
+        if self._unsynced:
+            timeout = max(0.0, self._last_fsync + self.fsync_interval - time.monotonic())
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch and batch[-1][1] is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Anything else already queued rides along
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._backlog + self._collect()
+            self._backlog = []
+            if not batch:
+                self._sync_pending()  # idle: the trailing batch's interval has passed
+                continue
+            try:
+                self._commit([row for row, _ in batch if row is not None])
+                if any(row is None for row, _ in batch):
+                    self._sync_pending()  # flush() marker
+            except Exception as e:
+                self._stats["errors"] += 1
+                print(f"[InteractionLog] Write failed: {e}")
+                for _, future in batch:
+                    if future is not None:
+                        future.set_exception(e)
+                # Fire-and-forget rows are retried with the next batch (bounded)
+                self._backlog = [(row, None) for row, future in batch if row is not None and future is None]
+                overflow = len(self._backlog) - self.max_batch * MAX_BACKLOG_BATCHES
+                if overflow > 0:
+                    self._stats["dropped"] += overflow
+                    self._backlog = self._backlog[overflow:]
+                time.sleep(self.flush_interval)
+                continue
+            for _, future in batch:
+                if future is not None:
+                    future.set_result(True)
+
+    def _commit(self, rows: List[dict]):
+        if not rows:
+            return
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=FIELDNAMES, lineterminator='\n')
+        writer.writerows(rows)
+        data = buffer.getvalue()
+
+        with self._file_lock:
+            with open(self.path, 'a', newline='') as f:
+                size_before = f.tell()
+                if size_before == 0:
+                    data = ','.join(FIELDNAMES) + '\n' + data
+                f.write(data)  # one write() per batch
+                f.flush()
+                if self._should_fsync():
+                    os.fsync(f.fileno())
+                    self._stats["fsyncs"] += 1
+                    self._unsynced = False
+                else:
+                    self._unsynced = self.fsync == 'interval'
+                size_after = f.tell()
+            # Row-count manifest: O(1) counts for the route and retrain scripts.
+            # The rows are already written; a stale manifest heals on next read
+            try:
+                record_append(self.path, size_before, len(rows), size_after)
+            except Exception as e:
+                print(f"[InteractionLog] Manifest update failed: {e}")
+        self._stats["rows"] += len(rows)
+        self._stats["batches"] += 1
+
+    def _sync_pending(self):
+        """fsync rows written since the last sync (interval mode only)."""
+        if not self._unsynced:
+            return
+        try:
+            with open(self.path, 'a') as f:
+                os.fsync(f.fileno())
+        except OSError as e:
+            self._stats["errors"] += 1
+            print(f"[InteractionLog] fsync failed: {e}")
+            return
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+        self._stats["fsyncs"] += 1
+
+    def _should_fsync(self) -> bool:
+        if self.fsync == 'always':
+            return True
+        if self.fsync == 'interval':
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                self._last_fsync = now
+                return True
+        return False
+
+    def get_stats(self) -> dict:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "queued": self._queue.qsize(),
+            "avg_batch_rows": round(self._stats["rows"] / batches, 2) if batches else 0.0,
+            "flush_interval_ms": self.flush_interval * 1000.0,
+            "fsync": self.fsync,
+        }
+
+
+# Singleton
+interaction_logger = InteractionLogger()
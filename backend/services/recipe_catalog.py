@@ -0,0 +1,414 @@
+"""
+RecipeCatalog — Whole-catalog recipe flavor computation for FlavorSense AI.
+
+Recipes (rows) and ingredients (columns) are indexed, and the recipe ×
+ingredient incidence is held as a CSR matrix (indptr / indices / data).
+Every recipe flavor is then one sparse-dense product against the ingredient
+flavor matrix from FlavorService, followed by a vectorized row normalization:
+
+    flavors = normalize_rows(incidence @ ingredient_vectors)
+
+Incremental updates only touch affected rows:
+    - upsert(): new or changed recipes are appended as new rows
+      (a changed recipe's old row is retired and compacted away later)
+    - refresh(): after flavor_vectors.json changes, only rows that use an
+      ingredient whose vector actually moved are recomputed
+
+The catalog holds at most cache.recipe_catalog_size recipes: past that, the
+least recently upserted rows are retired like superseded ones and dropped
+at the next compaction (feature_table(ensure=...) re-indexes any it needs).
+
+Recomputed rows are pushed into a FlavorIndex so nearest() can retrieve the
+top-K recipes for a user vector without scoring the whole catalog.
+
+Each row also keeps its recipe-side feature inputs (calories, price,
+ingredient count, cuisine, tags). Their RecipeColumns are kept row-aligned
+and only appended to or patched for changed rows; feature_table() wraps
+them in a RecipeFeatureTable once per catalog version. The table's content
+fingerprint is computed only when something reads it (saving the table for
+the registry).
+"""
+import hashlib
+import threading
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from services.flavor_service import flavor_service, VECTOR_DIM
+from services.recipe_flavor_store import recipe_flavor_store, RecipeFlavorStore
+from features.feature_builder import RecipeColumns, RecipeFeatureTable, recipe_side_inputs
+from utils.flavor_index import FlavorIndex
+from utils.model_config import model_config
+
+COMPACT_RATIO = 0.5  # compact once retired rows exceed this share of the matrix
+DEFAULT_CATALOG_SIZE = 50000
+
+
+def _load_catalog_size() -> int:
+    """The recipe bound from model_config.yaml."""
+    return int(model_config.get().value('cache', 'recipe_catalog_size', DEFAULT_CATALOG_SIZE))
+
+
+def _segment_sums(indptr: np.ndarray, rows: np.ndarray, indices: np.ndarray,
+                  data: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Sparse-dense product restricted to `rows`: (len(rows), 5)."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    out = np.zeros((len(rows), VECTOR_DIM))
+    if total == 0:
+        return out
+    # Positions of every stored entry belonging to `rows`, and which output row it feeds
+    segment = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    nnz = starts[segment] + offsets
+    contrib = vectors[indices[nnz]] * data[nnz, None]
+    for d in range(VECTOR_DIM):
+        out[:, d] = np.bincount(segment, weights=contrib[:, d], minlength=len(rows))
+    return out
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class RecipeCatalog:
+    """Indexed recipe catalog with a CSR recipe × ingredient incidence matrix."""
+
+    def __init__(self, max_recipes: Optional[int] = None):
+        self.max_recipes = max(1, max_recipes if max_recipes is not None else _load_catalog_size())
+        self._recipe_index: Dict[str, int] = {}
+        self._row_ids: List[Optional[str]] = []
+        self._row_hashes: List[str] = []
+        self._row_inputs: List[tuple] = []
+        self._ingredient_index: Dict[str, int] = {}
+        self._ingredient_names: List[str] = []
+        self._ingredient_vectors = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int64)
+        self._data = np.zeros(0, dtype=np.float32)
+        self._flavors = np.zeros((0, VECTOR_DIM))
+        self._retired = 0
+        self._last_used = np.zeros(0, dtype=np.int64)  # upsert tick per row, -1 once retired
+        self._tick = 0
+        self._evicted = 0
+        self._flavor_index = FlavorIndex()
+        self._dataset_version = flavor_service.dataset_version
+        self.version = 0
+        self._columns: Optional[RecipeColumns] = None  # feature columns for rows [0, len(_columns))
+        self._stale_rows: Set[int] = set()  # covered rows whose inputs or flavor changed since
+        self._feature_table: Optional[RecipeFeatureTable] = None
+        self._feature_table_version = -1
+        self._lock = threading.Lock()
+        if max_recipes is None:
+            model_config.subscribe(self._on_config_change)
+
+    def __len__(self):
+        return len(self._recipe_index)
+
+    def __contains__(self, recipe_id):
+        return str(recipe_id) in self._recipe_index
+
+    def _on_config_change(self, new, old):
+        size = max(1, int(new.value('cache', 'recipe_catalog_size', DEFAULT_CATALOG_SIZE)))
+        if size != self.max_recipes:
+            with self._lock:
+                self.max_recipes = size  # applied by the next upsert
+            print(f"[RecipeCatalog] Catalog bound set to {size}")
+
+    # ── Indexing ────────────────────────────────────────────────
+
+    def _ingredient_counts(self, ingredients: Sequence[str], new_names: List[str]) -> Dict[int, int]:
+        """Map ingredient names to {column: count}, registering unseen ones."""
+        counts: Dict[int, int] = {}
+        for ing in ingredients:
+            key = str(ing).lower().strip()
+            if not key:
+                continue
+            col = self._ingredient_index.get(key)
+            if col is None:
+                col = len(self._ingredient_names)
+                self._ingredient_index[key] = col
+                self._ingredient_names.append(key)
+                new_names.append(key)
+            counts[col] = counts.get(col, 0) + 1
+        return counts
+
+    def _append_rows(self, recipes: Sequence, hashes: Sequence[str], inputs: Sequence[tuple]) -> np.ndarray:
+        """Append CSR rows for recipes; returns their row numbers."""
+        first = len(self._row_ids)
+        new_names: List[str] = []
+        row_indices: List[int] = []
+        row_data: List[int] = []
+        lengths: List[int] = []
+        for recipe, ingredients_hash, row_inputs in zip(recipes, hashes, inputs):
+            counts = self._ingredient_counts(_ingredients_of(recipe), new_names)
+            row_indices.extend(counts.keys())
+            row_data.extend(counts.values())
+            lengths.append(len(counts))
+
+            recipe_id = _id_of(recipe)
+            old_row = self._recipe_index.get(recipe_id)
+            if old_row is not None:
+                self._row_ids[old_row] = None
+                self._last_used[old_row] = -1
+                self._retired += 1
+            self._recipe_index[recipe_id] = len(self._row_ids)
+            self._row_ids.append(recipe_id)
+            self._row_hashes.append(ingredients_hash)
+            self._row_inputs.append(row_inputs)
+
+        self._indptr = np.concatenate([
+            self._indptr, self._indptr[-1] + np.cumsum(np.asarray(lengths, dtype=np.int64))
+        ])
+        self._indices = np.concatenate([self._indices, np.asarray(row_indices, dtype=np.int64)])
+        self._data = np.concatenate([self._data, np.asarray(row_data, dtype=np.float32)])
+        self._last_used = np.concatenate([self._last_used, np.zeros(len(lengths), dtype=np.int64)])
+        if new_names:
+            self._ingredient_vectors = np.vstack([
+                self._ingredient_vectors, flavor_service.get_flavor_vectors(new_names)
+            ])
+        return np.arange(first, len(self._row_ids))
+
+    def _compute_rows(self, rows: np.ndarray):
+        """Recompute flavors for `rows` only (one sparse-dense product + normalization)."""
+        if len(self._flavors) < len(self._row_ids):
+            grown = np.zeros((len(self._row_ids), VECTOR_DIM))
+            grown[:len(self._flavors)] = self._flavors
+            self._flavors = grown
+        if len(rows):
+            sums = _segment_sums(self._indptr, rows, self._indices, self._data, self._ingredient_vectors)
+            self._flavors[rows] = _normalize_rows(sums)
+            live = [r for r in rows if self._row_ids[r] is not None]
+            if live:
+                self._flavor_index.add([self._row_ids[r] for r in live], self._flavors[live])
+
+    def _compact(self):
+        """Drop retired rows from the CSR arrays and flavor matrix."""
+        live = np.array([i for i, rid in enumerate(self._row_ids) if rid is not None], dtype=np.int64)
+        lengths = self._indptr[live + 1] - self._indptr[live]
+        segment_starts = np.repeat(self._indptr[live], lengths)
+        offsets = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        nnz = segment_starts + offsets
+        self._indices = self._indices[nnz]
+        self._data = self._data[nnz]
+        self._indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self._flavors = self._flavors[live]
+        self._last_used = self._last_used[live]
+        if self._columns is not None:
+            # Live rows already covered stay a prefix after compaction
+            self._columns = self._columns.take(live[live < len(self._columns)])
+            stale = np.fromiter(self._stale_rows, dtype=np.int64, count=len(self._stale_rows))
+            new_rows = np.searchsorted(live, stale)
+            kept = new_rows < len(live)
+            kept[kept] = live[new_rows[kept]] == stale[kept]
+            self._stale_rows = set(new_rows[kept].tolist())
+        self._row_ids = [self._row_ids[i] for i in live]
+        self._row_hashes = [self._row_hashes[i] for i in live]
+        self._row_inputs = [self._row_inputs[i] for i in live]
+        self._recipe_index = {rid: i for i, rid in enumerate(self._row_ids)}
+        self._retired = 0
+
+    def _evict_locked(self) -> int:
+        """Retire the least recently upserted rows beyond max_recipes; returns how many."""
+        excess = len(self._recipe_index) - self.max_recipes
+        if excess <= 0:
+            return 0
+        # Rows touched by the current upsert are never candidates
+        candidates = np.flatnonzero((self._last_used >= 0) & (self._last_used < self._tick))
+        if len(candidates) > excess:
+            oldest = np.argpartition(self._last_used[candidates], excess - 1)[:excess]
+            candidates = candidates[oldest]
+        ids = [self._row_ids[row] for row in candidates]
+        for row, recipe_id in zip(candidates, ids):
+            self._row_ids[row] = None
+            del self._recipe_index[recipe_id]
+        self._last_used[candidates] = -1
+        self._retired += len(ids)
+        self._evicted += len(ids)
+        self._flavor_index.remove(ids)
+        return len(ids)
+
+    def _refresh_locked(self) -> int:
+        flavor_service.refresh_if_modified()
+        if flavor_service.dataset_version == self._dataset_version:
+            return 0
+        self._dataset_version = flavor_service.dataset_version
+        if not self._ingredient_names:
+            return 0
+        fresh = flavor_service.get_flavor_vectors(self._ingredient_names)
+        changed = np.flatnonzero(np.any(fresh != self._ingredient_vectors, axis=1))
+        self._ingredient_vectors = fresh
+        if len(changed) == 0:
+            return 0
+        # Rows that reference any changed ingredient column
+        nnz_rows = np.repeat(np.arange(len(self._row_ids)), np.diff(self._indptr))
+        affected = np.unique(nnz_rows[np.isin(self._indices, changed)])
+        # Retired rows (superseded by an upsert) are dead until compaction
+        affected = np.array([r for r in affected if self._row_ids[r] is not None], dtype=np.int64)
+        self._compute_rows(affected)
+        self._stale_rows.update(affected.tolist())
+        self.version += 1
+        return len(affected)
+
+    def _sync_columns(self):
+        """Bring the feature columns up to date: patch stale rows, append new ones."""
+        covered = 0 if self._columns is None else len(self._columns)
+        stale = np.array(sorted(r for r in self._stale_rows if r < covered), dtype=np.int64)
+        if len(stale):
+            self._columns = self._columns.replace(stale, self._columns_of(stale))
+        if covered < len(self._row_ids):
+            fresh = self._columns_of(np.arange(covered, len(self._row_ids)))
+            self._columns = fresh if self._columns is None else self._columns.append(fresh)
+        self._stale_rows.clear()
+
+    def _columns_of(self, rows: np.ndarray) -> RecipeColumns:
+        return RecipeColumns.from_inputs(self._flavors[rows], [self._row_inputs[r] for r in rows])
+
+    # ── Public API ──────────────────────────────────────────────
+
+    def upsert(self, recipes: Sequence, keep: Sequence = ()) -> np.ndarray:
+        """
+        Index recipes (Recipe objects or dicts with id + ingredients) and
+        return their (n, 5) normalized flavor vectors. Only new or changed
+        recipes are computed; results also seed the RecipeFlavorStore.
+        Recipes in `keep` count as used too, so eviction spares them.
+        """
+        if not recipes:
+            return np.zeros((0, VECTOR_DIM))
+        with self._lock:
+            self._refresh_locked()
+            hashes = [RecipeFlavorStore.ingredients_hash(_ingredients_of(r)) for r in recipes]
+            inputs = [recipe_side_inputs(_feature_view(r)) for r in recipes]
+            pending, pending_hashes, pending_inputs = {}, {}, {}
+            inputs_changed = False
+            for recipe, h, row_inputs in zip(recipes, hashes, inputs):
+                recipe_id = _id_of(recipe)
+                row = self._recipe_index.get(recipe_id)
+                if row is None or self._row_hashes[row] != h:
+                    pending[recipe_id] = recipe
+                    pending_hashes[recipe_id] = h
+                    pending_inputs[recipe_id] = row_inputs
+                elif self._row_inputs[row] != row_inputs:
+                    # Same ingredients, different nutrition/price/tags: no flavor recompute
+                    self._row_inputs[row] = row_inputs
+                    self._stale_rows.add(row)
+                    inputs_changed = True
+            if pending:
+                new_rows = self._append_rows(list(pending.values()), list(pending_hashes.values()),
+                                             list(pending_inputs.values()))
+                self._compute_rows(new_rows)
+            self._tick += 1
+            used = [self._recipe_index.get(_id_of(r)) for r in [*recipes, *keep]]
+            self._last_used[[row for row in used if row is not None]] = self._tick
+            evicted = self._evict_locked()
+            if self._retired > COMPACT_RATIO * len(self._row_ids):
+                self._compact()
+            if pending or inputs_changed or evicted:
+                self.version += 1
+            rows = np.fromiter((self._recipe_index[_id_of(r)] for r in recipes),
+                               dtype=np.int64, count=len(recipes))
+            flavors = self._flavors[rows].copy()
+
+        if pending:
+            position = {_id_of(r): i for i, r in enumerate(recipes)}
+            for recipe_id, ingredients_hash in pending_hashes.items():
+                recipe_flavor_store.put_vector(recipe_id, None, flavors[position[recipe_id]],
+                                               ingredients_hash=ingredients_hash)
+        return flavors
+
+    def get_flavor(self, recipe_id) -> Optional[np.ndarray]:
+        """Flavor vector of one indexed recipe, or None if unknown."""
+        with self._lock:
+            self._refresh_locked()
+            row = self._recipe_index.get(str(recipe_id))
+            return None if row is None else self._flavors[row].copy()
+
+    def nearest(self, vector, k: int, among: Optional[Sequence[str]] = None) -> List[tuple]:
+        """
+        Top-k (recipe_id, cosine similarity) pairs closest to a flavor vector,
+        answered by the FlavorIndex. `among` restricts the search to given ids.
+        """
+        with self._lock:
+            self._refresh_locked()
+            allowed = None if among is None else [str(i) for i in among]
+            return self._flavor_index.query(vector, k, allowed=allowed)
+
+    def feature_table(self, ensure: Optional[Sequence] = None) -> RecipeFeatureTable:
+        """
+        Recipe-side feature table for the current catalog version. Built once
+        per version (only changed rows are recomputed) and shared until the
+        catalog changes; recipes in `ensure` that are not indexed yet are
+        upserted first so each has a row.
+        """
+        if ensure:
+            missing = [r for r in ensure if _id_of(r) not in self._recipe_index]
+            if missing:
+                self.upsert(missing, keep=ensure)
+        with self._lock:
+            self._refresh_locked()
+            table = self._feature_table
+            if table is not None and self._feature_table_version == self.version:
+                return table
+            self._sync_columns()
+            # Snapshots: the catalog keeps mutating these lists in place
+            ids, inputs = list(self._row_ids), list(self._row_inputs)
+            fingerprint = partial(_fingerprint, self._dataset_version, ids, list(self._row_hashes), inputs)
+            table = RecipeFeatureTable(ids, self._columns, fingerprint, inputs, row_of=dict(self._recipe_index))
+            self._feature_table = table
+            self._feature_table_version = self.version
+            return table
+
+    def refresh(self) -> int:
+        """Recompute rows affected by a flavor dataset change; returns rows touched."""
+        with self._lock:
+            return self._refresh_locked()
+
+    def get_stats(self) -> dict:
+        return {
+            "recipes": len(self._recipe_index),
+            "ingredients": len(self._ingredient_names),
+            "nnz": int(len(self._indices)),
+            "max_recipes": self.max_recipes,
+            "evicted": self._evicted,
+            "retired_rows": self._retired,
+            "version": self.version,
+            "feature_table": None if self._feature_table is None else self._feature_table_version,
+            "index": self._flavor_index.get_stats(),
+        }
+
+
+def _fingerprint(dataset_version, ids: Sequence[Optional[str]], hashes: Sequence[str],
+                 inputs: Sequence[tuple]) -> str:
+    """Content hash of a feature table's live rows (stable across processes)."""
+    digest = hashlib.blake2b(str(dataset_version).encode('utf-8'), digest_size=8)
+    for row in sorted((r for r, rid in enumerate(ids) if rid is not None), key=ids.__getitem__):
+        digest.update(f"\x1e{ids[row]}\x1f{hashes[row]}\x1f{inputs[row]!r}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _id_of(recipe) -> str:
+    return str(recipe.get('id', '') if isinstance(recipe, dict) else recipe.id)
+
+
+def _ingredients_of(recipe) -> List[str]:
+    return list(recipe.get('ingredients', []) if isinstance(recipe, dict) else recipe.ingredients)
+
+
+def _feature_view(recipe) -> dict:
+    """Recipe as the dict build_features() reads (routes normalize Recipe objects the same way)."""
+    if isinstance(recipe, dict):
+        return recipe
+    return {
+        'ingredients': recipe.ingredients,
+        'nutrition': recipe.nutrition_info or {},
+        'price': recipe.price_approx,
+        'tags': recipe.diet_tags or [],
+        'cuisine': '',
+    }
+
+
+# Singleton
+recipe_catalog = RecipeCatalog()
@@ -0,0 +1,120 @@
+"""
+RecipeFlavorStore — Precomputed recipe flavor profiles for FlavorSense AI.
+
+A recipe's flavor is the normalized sum of its ingredient vectors. It is
+computed once when the recipe enters the system (RecipeService parsing,
+recipes_cache.json, mock data) and served from here afterwards.
+
+Key: recipe id + hash of the normalized ingredient list, so an edited
+ingredient list never serves a stale vector. The whole store is dropped
+when FlavorService reports a new dataset_version.
+"""
+import hashlib
+import threading
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from services.flavor_service import flavor_service, VECTOR_DIM
+from utils.cache import LRUCache
+from utils.model_config import model_config
+
+DEFAULT_STORE_SIZE = 50000
+
+
+def _load_store_size() -> int:
+    return int(model_config.get().value('cache', 'recipe_flavor_store_size', DEFAULT_STORE_SIZE))
+
+
+def compute_recipe_flavor(ingredients: Iterable[str]) -> np.ndarray:
+    """Normalized sum of ingredient flavor vectors (zeros for an empty recipe)."""
+    ingredients = list(ingredients or [])
+    if not ingredients:
+        return np.zeros(VECTOR_DIM)
+    total = flavor_service.get_flavor_vectors(ingredients).sum(axis=0, dtype=float)
+    norm = np.linalg.norm(total)
+    return total / norm if norm > 0 else total
+
+
+class RecipeFlavorStore:
+    """Recipe flavor vectors keyed by (recipe id, ingredient-list hash)."""
+
+    def __init__(self, max_size: Optional[int] = None):
+        self._store = LRUCache(max_size=max_size or _load_store_size())
+        self._dataset_version = flavor_service.dataset_version
+        self._lock = threading.Lock()
+        if max_size is None:
+            model_config.subscribe(self._on_config_change)
+
+    @staticmethod
+    def ingredients_hash(ingredients: Iterable[str]) -> str:
+        """Stable short hash of the ingredient list as FlavorService keys it."""
+        joined = '\x1f'.join(str(i).lower().strip() for i in ingredients or [])
+        return hashlib.blake2b(joined.encode('utf-8'), digest_size=8).hexdigest()
+
+    def _on_config_change(self, new, old):
+        size = int(new.value('cache', 'recipe_flavor_store_size', DEFAULT_STORE_SIZE))
+        if size != self._store.max_size:
+            with self._lock:
+                self._store.resize(size)
+            print(f"[RecipeFlavorStore] Store bound set to {size}")
+
+    def _key(self, recipe_id, ingredients: List[str], ingredients_hash: Optional[str] = None) -> str:
+        return f"{recipe_id or ''}:{ingredients_hash or self.ingredients_hash(ingredients)}"
+
+    def _check_dataset(self):
+        """Drop every stored vector if the flavor dataset changed."""
+        flavor_service.refresh_if_modified()
+        if flavor_service.dataset_version != self._dataset_version:
+            self._store.clear()
+            self._dataset_version = flavor_service.dataset_version
+
+    def put(self, recipe_id, ingredients: Iterable[str]) -> np.ndarray:
+        """Compute and store a recipe's flavor vector (ingestion time)."""
+        ingredients = list(ingredients or [])
+        with self._lock:
+            self._check_dataset()
+            vector = compute_recipe_flavor(ingredients)
+            vector.setflags(write=False)
+            self._store.set(self._key(recipe_id, ingredients), vector)
+        return vector
+
+    def put_vector(self, recipe_id, ingredients: Iterable[str], vector: np.ndarray,
+                   ingredients_hash: Optional[str] = None):
+        """Store a vector computed elsewhere (e.g. RecipeCatalog bulk ingestion)."""
+        vector = np.array(vector, dtype=float)
+        vector.setflags(write=False)
+        key = self._key(recipe_id, list(ingredients or []), ingredients_hash)
+        with self._lock:
+            self._check_dataset()
+            self._store.set(key, vector)
+
+    def get(self, recipe_id, ingredients: Iterable[str]) -> np.ndarray:
+        """Returns the stored flavor vector, computing it on first sight."""
+        ingredients = list(ingredients or [])
+        key = self._key(recipe_id, ingredients)
+        with self._lock:
+            self._check_dataset()
+            vector = self._store.get(key)
+        if vector is not None:
+            return vector
+        return self.put(recipe_id, ingredients)
+
+    def invalidate(self, recipe_id=None):
+        """Forget one recipe's vectors, or everything when no id is given."""
+        with self._lock:
+            if recipe_id is None:
+                self._store.clear()
+                return
+            prefix = f"{recipe_id}:"
+            for key in [k for k in self._store.keys() if k.startswith(prefix)]:
+                self._store.pop(key)
+
+    def get_stats(self) -> dict:
+        stats = self._store.get_stats()
+        stats["dataset_version"] = self._dataset_version
+        return stats
+
+
+# Singleton
+recipe_flavor_store = RecipeFlavorStore()
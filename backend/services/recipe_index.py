@@ -0,0 +1,148 @@
+"""
+RecipeIndex — Recipes by id, with precomputed flavor vectors, for FlavorSense AI.
+
+Two sources feed one in-memory index:
+    - data/recipes_cache.json, loaded on first use and re-read when its
+      mtime changes (checked at most every FILE_CHECK_INTERVAL)
+    - every recipe RecipeService ingests (Foodoscope results, mock data),
+      added with the flavors RecipeCatalog already computed
+
+A lookup is a dict get, so /api/interaction never parses JSON or scans the
+catalog. Only ids the index has never seen fall through to the API.
+Vectors are recomputed lazily when FlavorService reports a new
+dataset_version.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Sequence, Set
+
+import numpy as np
+
+from services.flavor_service import flavor_service
+from services.recipe_flavor_store import recipe_flavor_store
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECIPES_CACHE_PATH = os.path.join(BASE_DIR, 'data', 'recipes_cache.json')
+FILE_CHECK_INTERVAL = 5.0  # seconds between recipes_cache.json mtime checks
+
+
+class RecipeIndex:
+    """recipe id → (recipe, flavor vector) for recipes_cache.json and ingested recipes."""
+
+    def __init__(self, path: str = RECIPES_CACHE_PATH):
+        self.path = path
+        self._recipes: Dict[str, object] = {}
+        self._flavors: Dict[str, np.ndarray] = {}
+        self._file_ids: Set[str] = set()
+        self._file_mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._dataset_version = flavor_service.dataset_version
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "file_loads": 0}
+
+    # ── Loading ─────────────────────────────────────────────────
+
+    def refresh_if_modified(self) -> bool:
+        """Load recipes_cache.json if it is new or changed; returns True on a load."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + FILE_CHECK_INTERVAL
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return False
+            if mtime == self._file_mtime:
+                return False
+            try:
+                with open(self.path, 'r') as f:
+                    recipes = [r for r in json.load(f) if r.get('id') is not None]
+            except Exception as e:
+                print(f"[RecipeIndex] Could not load {self.path}: {e}")
+                self._file_mtime = mtime  # retry once the file changes again
+                return False
+
+            ids = {str(r['id']) for r in recipes}
+            for recipe_id in self._file_ids - ids:
+                self._recipes.pop(recipe_id, None)
+                self._flavors.pop(recipe_id, None)
+            for recipe in recipes:
+                recipe_id = str(recipe['id'])
+                self._recipes[recipe_id] = recipe
+                self._flavors[recipe_id] = recipe_flavor_store.get(recipe_id, recipe.get('ingredients', []))
+            self._file_ids = ids
+            self._file_mtime = mtime
+            self._stats["file_loads"] += 1
+        print(f"[RecipeIndex] Indexed {len(ids)} recipes from {os.path.basename(self.path)}")
+        return True
+
+    def add(self, recipes: Sequence, flavors: Optional[Iterable[np.ndarray]] = None):
+        """Index ingested recipes (Recipe objects or dicts), with their flavors if known."""
+        flavors = list(flavors) if flavors is not None else [None] * len(recipes)
+        with self._lock:
+            for recipe, flavor in zip(recipes, flavors):
+                recipe_id = str(recipe.get('id', '') if isinstance(recipe, dict) else recipe.id)
+                self._recipes[recipe_id] = recipe
+                self._file_ids.discard(recipe_id)  # newer than the file's copy
+                if flavor is None:
+                    self._flavors.pop(recipe_id, None)
+                else:
+                    vector = np.array(flavor, dtype=float)
+                    vector.setflags(write=False)
+                    self._flavors[recipe_id] = vector
+
+    # ── Lookups ─────────────────────────────────────────────────
+
+    def get(self, recipe_id) -> Optional[object]:
+        """The indexed recipe (dict from the file, or a Recipe), or None."""
+        self.refresh_if_modified()
+        return self._recipes.get(str(recipe_id))
+
+    def get_flavor(self, recipe_id) -> Optional[np.ndarray]:
+        """Precomputed flavor vector (read-only), or None for an unknown id."""
+        self.refresh_if_modified()
+        flavor_service.refresh_if_modified()
+        if flavor_service.dataset_version != self._dataset_version:
+            with self._lock:
+                self._flavors.clear()
+                self._dataset_version = flavor_service.dataset_version
+
+        recipe_id = str(recipe_id)
+        flavor = self._flavors.get(recipe_id)
+        if flavor is not None:
+            self._stats["hits"] += 1
+            return flavor
+        recipe = self._recipes.get(recipe_id)
+        if recipe is None:
+            self._stats["misses"] += 1
+            return None
+        # Known recipe without a current vector (new dataset or added bare)
+        ingredients = recipe.get('ingredients', []) if isinstance(recipe, dict) else recipe.ingredients
+        flavor = recipe_flavor_store.get(recipe_id, ingredients)
+        self._flavors[recipe_id] = flavor
+        self._stats["hits"] += 1
+        return flavor
+
+    def __contains__(self, recipe_id):
+        self.refresh_if_modified()
+        return str(recipe_id) in self._recipes
+
+    def __len__(self):
+        return len(self._recipes)
+
+    def get_stats(self) -> dict:
+        return {
+            **self._stats,
+            "recipes": len(self._recipes),
+            "file_recipes": len(self._file_ids),
+            "flavors": len(self._flavors),
+        }
+
+
+# Singleton
+recipe_index = RecipeIndex()
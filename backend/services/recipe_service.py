@@ -1,10 +1,10 @@
 import requests
-import numpy as np
 from typing import List, Optional, Dict, Any
 from models.recipe_model import Recipe
 from utils.cache import cache
 from config import Config
-from services.flavor_service import flavor_service
+from services.recipe_catalog import recipe_catalog
+from services.recipe_index import recipe_index
 
 class RecipeService:
     """
@@ -26,14 +26,6 @@ class RecipeService:
         """Check if we have a valid token for live API calls."""
         return bool(self.token) and self.token != 'your_token_here'
 
-    @staticmethod
-    def _compute_flavor(ingredients: list) -> np.ndarray:
-        """Compute mean flavor vector from ingredient list using FlavorService."""
-        if not ingredients:
-            return np.zeros(5)
-        vectors = [flavor_service.get_flavor_vector(ing) for ing in ingredients]
-        return np.mean(vectors, axis=0)
-
     def _api_get(self, path: str, params: Dict = None) -> Optional[Any]:
         """
         Makes a GET request to the Foodoscope API.
@@ -111,33 +103,43 @@ class RecipeService:
         # Image
         image_url = raw.get('img_url', raw.get('image_url', ''))
 
-        # Compute flavor profile from ingredients
-        flavor_profile = self._compute_flavor(ingredients)
-
+        # Flavor profile is filled in by _ingest() for the whole parsed batch
         return Recipe(
             id=recipe_id,
             title=title,
             ingredients=ingredients,
-            flavor_profile=flavor_profile,
             nutrition_info=nutrition,
             price_approx=price,
             diet_tags=diet_tags,
             image_url=image_url
         )
 
+    @staticmethod
+    def _ingest(recipes: List[Recipe]) -> List[Recipe]:
+        """
+        Registers recipes in the RecipeCatalog, which computes flavor profiles
+        for the whole batch at once (only new or changed recipes are computed),
+        and in the RecipeIndex for by-id lookups.
+        """
+        flavors = recipe_catalog.upsert(recipes)
+        for recipe, flavor in zip(recipes, flavors):
+            recipe.flavor_profile = flavor
+        recipe_index.add(recipes, flavors)
+        return recipes
+
     def _parse_recipes(self, data: Any) -> List[Recipe]:
         """Parses API response (list or dict with results) into Recipe list."""
         if data is None:
             return []
         if isinstance(data, list):
-            return [self._parse_recipe(r) for r in data]
+            return self._ingest([self._parse_recipe(r) for r in data])
         if isinstance(data, dict):
             # Some endpoints wrap results
             results = data.get('results', data.get('recipes', data.get('data', [])))
             if isinstance(results, list):
-                return [self._parse_recipe(r) for r in results]
+                return self._ingest([self._parse_recipe(r) for r in results])
             # Single recipe object
-            return [self._parse_recipe(data)]
+            return self._ingest([self._parse_recipe(data)])
         return []
 
     # ──────────────────────────────────────────────
@@ -231,11 +233,10 @@ class RecipeService:
         for d in mock_data:
             recipes.append(Recipe(
                 id=d["id"], title=d["title"], ingredients=d["ingredients"],
-                flavor_profile=self._compute_flavor(d["ingredients"]),
                 nutrition_info=d["nutrition"],
                 price_approx=d["price"], diet_tags=d["tags"]
             ))
-        return recipes
+        return self._ingest(recipes)
 
     def _get_mock_recipes_filtered(self, title: str = None, diet: str = None) -> List[Recipe]:
         """Returns mock recipes filtered by title or diet for fallback."""
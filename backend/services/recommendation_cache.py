@@ -0,0 +1,138 @@
+"""
+Recommendation Cache for FlavorSense AI
+Materialized /api/recommend responses per user.
+
+Key: (user_id, request fingerprint, model key, catalog version)
+    - request fingerprint: blake2b of the request body (sorted JSON), which
+      together with the stored profile determines the merged ranking profile
+    - model key / catalog version: a hot swap or catalog change misses
+      instead of serving results from the old model or recipe set
+
+Entries are dropped when user_service changes the user's stored profile
+(update_flavor_from_history after /api/interaction, or an onboarding
+update), when they outlive recommendation_cache_ttl_seconds, or by LRU
+eviction beyond recommendation_cache_size. Both settings follow live
+edits of model_config.yaml unless passed to the constructor.
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from utils.cache import LRUCache
+from utils.model_config import model_config
+
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_TTL_SECONDS = 300
+
+
+def request_fingerprint(data: dict) -> str:
+    """Stable short hash of a request body."""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=12).hexdigest()
+
+
+class RecommendationCache:
+    """LRU of response payloads with TTL and per-user invalidation."""
+
+    def __init__(self, max_size: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self._fixed_size = max_size
+        self._fixed_ttl = ttl_seconds
+        self._store = LRUCache(max_size=1)
+        self._keys_by_user: Dict[str, Set[tuple]] = {}
+        self._lock = threading.Lock()
+        self.expirations = 0
+        self.invalidations = 0
+        self._apply_config(model_config.get())
+        if max_size is None or ttl_seconds is None:
+            model_config.subscribe(lambda new, old: self._apply_config(new))
+
+    def _apply_config(self, config):
+        """Set TTL and bound from the cache section (constructor arguments win)."""
+        cache = config.section('cache')
+        ttl = float(self._fixed_ttl if self._fixed_ttl is not None
+                    else cache.get('recommendation_cache_ttl_seconds', DEFAULT_TTL_SECONDS))
+        size = self._fixed_size or int(cache.get('recommendation_cache_size', DEFAULT_CACHE_SIZE))
+        with self._lock:
+            self.ttl = ttl
+            self.enabled = ttl > 0 and size > 0
+            if not self.enabled:
+                self._store.clear()
+                self._keys_by_user.clear()
+            for key, _ in self._store.resize(max(1, size)):
+                self._forget(key)
+
+    @staticmethod
+    def make_key(user_id: str, data: dict, model_key, catalog_version) -> tuple:
+        return (str(user_id), request_fingerprint(data), model_key, catalog_version)
+
+    def get(self, key: tuple) -> Optional[dict]:
+        """Cached payload for key, or None (missing or expired)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                return None
+            expiry, payload = entry
+            if time.monotonic() > expiry:
+                self._drop(key)
+                self.expirations += 1
+                # Counted as a hit by the LRU; it was really a miss
+                self._store.hits -= 1
+                self._store.misses += 1
+                return None
+            return payload
+
+    def set(self, key: tuple, payload: dict):
+        if not self.enabled:
+            return
+        with self._lock:
+            evicted = self._store.set(key, (time.monotonic() + self.ttl, payload))
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+            if evicted is not None:
+                self._forget(evicted[0])
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop every cached response for a user; returns how many were dropped."""
+        with self._lock:
+            keys = self._keys_by_user.pop(str(user_id), set())
+            for key in keys:
+                self._store.pop(key)
+            if keys:
+                self.invalidations += 1
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self._keys_by_user.clear()
+
+    def _drop(self, key: tuple):
+        self._store.pop(key)
+        self._forget(key)
+
+    def _forget(self, key: tuple):
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def get_stats(self) -> dict:
+        stats = self._store.get_stats()
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl,
+            "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "users": len(self._keys_by_user),
+        })
+        return stats
+
+
+# Singleton
+recommendation_cache = RecommendationCache()
@@ -1,17 +1,17 @@
 from typing import List
 from models.user_model import User
 from models.recipe_model import Recipe
-from services.flavor_service import flavor_service
-from utils.similarity import calculate_similarity
-from utils.filters import filter_recipes
+from services.recipe_flavor_store import compute_recipe_flavor
 import numpy as np
 
+BUDGET_BOOST = 0.1  # rerank bonus for recipes under a quarter of the daily budget
+
 
 class RecommendationEngine:
     """
-    Core recommendation logic.
-    Builds recipe flavor vectors from offline FlavorDB data,
-    then ranks by cosine similarity against user preference vector.
+    Recommendation entry point for User objects (meal plans, search).
+    Delegates to the RecommendationPipeline: hard filters, flavor-space
+    prescore, ML rank (cosine fallback), budget-boost rerank.
     """
 
     def _calculate_recipe_flavor(self, ingredients: List[str]) -> np.ndarray:
@@ -19,57 +19,33 @@ class RecommendationEngine:
         Builds recipe flavor vector from ingredient list.
         Sum ingredient vectors → Normalize.
         """
-        if not ingredients:
-            return np.zeros(5)
-
-        total_vector = np.zeros(5)
-        for ing in ingredients:
-            total_vector += flavor_service.get_flavor_vector(ing)
-
-        norm = np.linalg.norm(total_vector)
-        if norm > 0:
-            return total_vector / norm
-        return np.zeros(5)
-
-    def _score_and_rank(self, user: User, recipes: List[Recipe], top_n: int) -> List[Recipe]:
-        """Shared scoring pipeline: compute flavor → cosine sim → rank → return top N."""
-        if not recipes:
-            return []
-
-        scored = []
-        for recipe in recipes:
-            # Dynamically compute flavor profile using offline FlavorDB vectors
-            recipe.flavor_profile = self._calculate_recipe_flavor(recipe.ingredients)
-
-            # Cosine similarity with user preference
-            sim_score = calculate_similarity(user.flavor_preference_vector, recipe.flavor_profile)
-
-            # Budget heuristic boost
-            if user.daily_budget > 0 and recipe.price_approx < (user.daily_budget / 4):
-                sim_score += 0.1
-
-            scored.append((sim_score, recipe))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [r for _, r in scored[:top_n]]
+        return compute_recipe_flavor(ingredients)
+
+    def _run_pipeline(self, user: User, recipes: List[Recipe], top_n: int) -> List[Recipe]:
+        """Shared path: the RecommendationPipeline with the full hard filters and budget boost."""
+        from services.recommendation_pipeline import recommendation_pipeline, PipelineRequest, profile_from_user
+        result = recommendation_pipeline.run(PipelineRequest(
+            profile=profile_from_user(user),
+            top_n=top_n,
+            user=user,
+            candidates=recipes,
+            budget_boost=BUDGET_BOOST,
+        ))
+        return result.recipes
 
     def recommend(self, user: User, top_n: int = 5) -> List[Recipe]:
         """
         Original recommendation path.
-        Fetches ALL recipes from RecipeService (live API or mock),
-        applies hard filters, then ranks by flavor similarity.
+        Fetches ALL recipes from RecipeService (live API or mock), then runs
+        them through the RecommendationPipeline.
         """
         from services.recipe_service import recipe_service
-        candidates = recipe_service.get_all_recipes()
-        filtered = filter_recipes(user, candidates)
-        return self._score_and_rank(user, filtered, top_n)
+        return self._run_pipeline(user, recipe_service.get_all_recipes(), top_n)
 
     def recommend_from_recipes(self, user: User, recipes: List[Recipe], top_n: int = 5) -> List[Recipe]:
         """
         Recommendation path for pre-fetched recipes (e.g. from search or cuisine filter).
-        Applies hard filters, then ranks by flavor similarity.
         """
-        filtered = filter_recipes(user, recipes)
-        return self._score_and_rank(user, filtered, top_n)
+        return self._run_pipeline(user, recipes, top_n)
 
 recommendation_engine = RecommendationEngine()
@@ -0,0 +1,291 @@
+"""
+RecommendationPipeline — Single retrieve-then-rank flow for FlavorSense AI.
+
+Stages (each capped by a candidate limit from the `pipeline:` config
+section, and timed):
+    1. retrieve  — candidate Recipes (caller-supplied, diet lookup, or all)
+    2. filter    — hard constraints (allergens; full utils.filters rules
+                   when a User is given)
+    3. prescore  — cheap flavor-space cut to the top prescore_k via the
+                   RecipeCatalog nearest-neighbour index
+    4. rank      — ML model (or cosine fallback) via model_service
+    5. rerank    — optional budget boost, then cut to top_n
+
+Used by /api/recommend and by RecommendationEngine (/api/mealplan), so the
+expensive stages are bounded no matter how many recipes retrieval returns.
+
+run_batch() is the many-users variant (/api/recommend/batch, offline jobs):
+retrieval and recipe-side features are shared, and each chunk of users is
+prescored with one matrix product and ranked with one model call.
+
+    for entry in recommendation_pipeline.run_batch(["u1", {"user_id": "u2", ...}]):
+        ...
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from models.recipe_model import Recipe
+from models.user_model import User
+from services.recipe_catalog import recipe_catalog
+from utils.filters import filter_recipes
+
+DEFAULT_LIMITS = {
+    'retrieve_limit': 5000,   # max candidates taken from retrieval
+    'prescore_k': 200,        # candidates kept for ML ranking
+    'rank_k': 50,             # ML results kept for reranking
+    'diet_fetch_limit': 20,   # live API diet lookup size
+    'batch_users': 256,       # users scored per model call in run_batch()
+}
+
+
+@dataclass
+class PipelineRequest:
+    """Inputs for one pipeline run."""
+    profile: dict                          # ranking profile (user_service.build_profile_for_ranking)
+    top_n: Optional[int] = None            # default model.top_n
+    user: Optional[User] = None            # enables the full utils.filters hard filters
+    candidates: Optional[List[Recipe]] = None
+    explain: bool = False
+    deadline_ms: Optional[float] = None
+    budget_boost: float = 0.0              # rerank: bonus for recipes under budget/4
+
+
+@dataclass
+class PipelineResult:
+    ranked: List[tuple]                    # (score, recipe_dict, explanation, confidence)
+    recipes: List[Recipe]                  # Recipe objects in ranked order
+    metadata: dict
+    stages: Dict[str, dict] = field(default_factory=dict)
+
+
+class RecommendationPipeline:
+    """retrieve → filter → prescore → rank → rerank, each stage capped and timed."""
+
+    def __init__(self, limits: Optional[dict] = None):
+        from ml.model_service import model_service
+        self._model_service = model_service
+        self._overrides = dict(limits or {})
+
+    @property
+    def limits(self) -> dict:
+        """DEFAULT_LIMITS ← current `pipeline:` config ← constructor overrides."""
+        configured = self._model_service.config.get('pipeline', {}) or {}
+        return {**DEFAULT_LIMITS, **configured, **self._overrides}
+
+    # ── Stages ──────────────────────────────────────────────────
+
+    def _retrieve(self, request: PipelineRequest) -> List[Recipe]:
+        """Uncapped candidate list (run() applies retrieve_limit)."""
+        if request.candidates is not None:
+            candidates = request.candidates
+        else:
+            from services.recipe_service import recipe_service
+            diet = request.profile.get('diet_type', '')
+            if request.user is None and diet and recipe_service.is_live:
+                candidates = recipe_service.filter_by_diet(diet, limit=self.limits['diet_fetch_limit'])
+            else:
+                candidates = recipe_service.get_all_recipes()
+        return list(candidates)
+
+    @staticmethod
+    def _filter(request: PipelineRequest, recipes: List[Recipe]) -> List[Recipe]:
+        if request.user is not None:
+            return filter_recipes(request.user, recipes)
+        allergens = [a.lower() for a in request.profile.get('allergies', []) or []]
+        if not allergens:
+            return recipes
+        return [
+            r for r in recipes
+            if not any(a in ing.lower() for ing in r.ingredients for a in allergens)
+        ]
+
+    def _prescore(self, request: PipelineRequest, recipes: List[Recipe]) -> List[Recipe]:
+        k = self.limits['prescore_k']
+        if len(recipes) <= k:
+            return recipes
+        nearest = recipe_catalog.nearest(
+            request.profile.get('flavor_vector', [0] * 5), k,
+            among=[r.id for r in recipes]
+        )
+        keep = {recipe_id for recipe_id, _ in nearest}
+        return [r for r in recipes if str(r.id) in keep]
+
+    def _rank(self, request: PipelineRequest, recipes: List[Recipe], top_n: int) -> dict:
+        candidates = [_ranking_dict(r) for r in recipes]
+        # Keep extra rows only when rerank can reorder them
+        keep = max(top_n, self.limits['rank_k']) if request.budget_boost else top_n
+        return self._model_service.rank_recipes(
+            request.profile, candidates,
+            top_n=keep,
+            explain=request.explain,
+            deadline_ms=request.deadline_ms,
+        )
+
+    @staticmethod
+    def _rerank(request: PipelineRequest, ranked: List[tuple], top_n: int) -> List[tuple]:
+        budget = float(request.profile.get('daily_budget', 0) or 0)
+        if request.budget_boost and budget > 0 and ranked:
+            prices = np.array([float(item[1].get('price_approx', 0) or 0) for item in ranked])
+            boosted = np.array([item[0] for item in ranked], dtype=float) + request.budget_boost * (prices < budget / 4)
+            order = np.argsort(-boosted, kind='stable')
+            ranked = [(float(boosted[i]),) + tuple(ranked[i][1:]) for i in order]
+        return ranked[:top_n]
+
+    # ── Run ─────────────────────────────────────────────────────
+
+    def run(self, request: PipelineRequest) -> PipelineResult:
+        top_n = request.top_n or self._model_service.config['model']['top_n']
+        stages: Dict[str, dict] = {}
+
+        def timed(name, count_in, fn, *args):
+            start = time.perf_counter()
+            out = fn(*args)
+            count_out = len(out['ranked']) if isinstance(out, dict) else len(out)
+            stages[name] = {"in": count_in, "out": count_out,
+                            "ms": round((time.perf_counter() - start) * 1000, 2)}
+            return out
+
+        retrieved = {}
+
+        def retrieve():
+            candidates = self._retrieve(request)
+            retrieved['count'] = len(candidates)
+            return candidates[:self.limits['retrieve_limit']]
+
+        recipes = timed('retrieve', None, retrieve)
+        stages['retrieve']['in'] = retrieved['count']
+        recipes = timed('filter', len(recipes), self._filter, request, recipes)
+        recipes = timed('prescore', len(recipes), self._prescore, request, recipes)
+        result = timed('rank', len(recipes), self._rank, request, recipes, top_n)
+        ranked = timed('rerank', len(result['ranked']), self._rerank, request, result['ranked'], top_n)
+
+        by_id = {str(r.id): r for r in recipes}
+        return PipelineResult(
+            ranked=ranked,
+            recipes=[by_id[str(item[1]['id'])] for item in ranked],
+            metadata=result['metadata'],
+            stages=stages,
+        )
+
+    # ── Batch ───────────────────────────────────────────────────
+
+    def run_batch(self, users: Iterable, top_n: Optional[int] = None,
+                  candidates: Optional[List[Recipe]] = None) -> Iterator[dict]:
+        """
+        Recommendations for many users, yielded one JSON-ready dict per user
+        in input order. `users` holds profile dicts (as posted to
+        /api/recommend) or ids of known users; unknown ids yield an "error".
+
+        Retrieval is shared (all recipes, or `candidates`), so the live-API
+        diet lookup of run() is skipped; diet still counts as a ranking feature.
+        """
+        top_n = top_n or self._model_service.config['model']['top_n']
+        recipes = self._retrieve(PipelineRequest(profile={}, candidates=candidates))
+        recipes = recipes[:self.limits['retrieve_limit']]
+        shared = _BatchCandidates(recipes)
+
+        chunk = []
+        for user in users:
+            chunk.append(user)
+            if len(chunk) >= self.limits['batch_users']:
+                yield from self._run_chunk(chunk, shared, top_n)
+                chunk = []
+        if chunk:
+            yield from self._run_chunk(chunk, shared, top_n)
+
+    def _run_chunk(self, users: list, shared: '_BatchCandidates', top_n: int) -> Iterator[dict]:
+        from services.user_service import user_service
+
+        entries = []
+        for user in users:
+            if isinstance(user, dict):
+                entries.append(user_service.build_profile_for_ranking(user))
+            else:
+                entries.append(user_service.get_profile(str(user)) or {"user_id": str(user), "error": "unknown user"})
+        profiles = [p for p in entries if "error" not in p]
+
+        # Prescore: flavor cosine for every (user, recipe) pair as one (U, N) product
+        flavors = np.array([p.get('flavor_vector', [0] * 5) for p in profiles], dtype=float).reshape(len(profiles), 5)
+        norms = np.linalg.norm(flavors, axis=1, keepdims=True)
+        sims = np.divide(flavors, norms, out=np.zeros_like(flavors), where=norms > 0) @ shared.unit_flavors.T
+
+        k = self.limits['prescore_k']
+        candidates = []
+        for u, profile in enumerate(profiles):
+            allowed = np.flatnonzero(shared.allowed(profile.get('allergies', [])))
+            if len(allowed) > k:
+                allowed = allowed[np.argpartition(-sims[u, allowed], k - 1)[:k]]
+            candidates.append(allowed)
+
+        result = self._model_service.rank_recipes_batch(profiles, shared.dicts, candidates, top_n=top_n)
+        ranked = iter(result['ranked'])
+        metadata = result['metadata']
+        for entry in entries:
+            if "error" in entry:
+                yield {"user_id": entry["user_id"], "error": entry["error"]}
+                continue
+            results = [
+                dict(recipe, relevance_score=round(float(score), 4), confidence=confidence)
+                for score, recipe, _, confidence in next(ranked)
+            ]
+            yield {
+                "user_id": entry.get('user_id'),
+                "ranking_source": metadata.get("ranking_source", "unknown"),
+                "model_version": metadata.get("model_version", "none"),
+                "count": len(results),
+                "results": results,
+            }
+
+
+class _BatchCandidates:
+    """Recipe-side data shared by every user of a run_batch() call."""
+
+    def __init__(self, recipes: List[Recipe]):
+        self.dicts = [_ranking_dict(r) for r in recipes]
+        table = recipe_catalog.feature_table(ensure=self.dicts)
+        flavors = table.columns.flavors[table.rows_for([d['id'] for d in self.dicts])] if self.dicts \
+            else np.zeros((0, 5))
+        norms = np.linalg.norm(flavors, axis=1, keepdims=True)
+        self.unit_flavors = np.divide(flavors, norms, out=np.zeros_like(flavors), where=norms > 0)
+        self._ingredients = [[ing.lower() for ing in r.ingredients] for r in recipes]
+        self._blocked: Dict[str, np.ndarray] = {}
+
+    def allowed(self, allergies: List[str]) -> np.ndarray:
+        """Boolean mask of recipes free of every allergen (per-allergen masks cached)."""
+        mask = np.ones(len(self.dicts), dtype=bool)
+        for allergen in allergies or []:
+            allergen = allergen.lower()
+            if allergen not in self._blocked:
+                self._blocked[allergen] = np.array(
+                    [any(allergen in ing for ing in ings) for ings in self._ingredients], dtype=bool
+                ).reshape(len(self._ingredients))
+            mask &= ~self._blocked[allergen]
+        return mask
+
+
+def profile_from_user(user: User) -> dict:
+    """Ranking profile for a User object (mealplan / legacy engine callers)."""
+    return {
+        'user_id': user.id,
+        'flavor_vector': np.asarray(user.flavor_preference_vector, dtype=float).tolist(),
+        'diet_type': user.diet_type,
+        'daily_budget': user.daily_budget,
+        'allergies': list(user.allergies),
+    }
+
+
+def _ranking_dict(recipe: Recipe) -> dict:
+    """Recipe as the dict the feature builder and API responses use."""
+    d = recipe.to_dict()
+    d.setdefault('cuisine', '')
+    d.setdefault('price', d.get('price_approx', 0))
+    d.setdefault('nutrition', d.get('nutrition_info', {}))
+    d.setdefault('tags', d.get('diet_tags', []))
+    return d
+
+
+# Singleton
+recommendation_pipeline = RecommendationPipeline()
@@ -5,19 +5,12 @@ Manages user profiles with data-driven flavor vector evolution.
 import csv
 import numpy as np
 from typing import Dict, Optional, List
-import yaml
 import os
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-
-def _load_config():
-    config_path = os.path.join(BASE_DIR, 'config', 'model_config.yaml')
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+from services.recommendation_cache import recommendation_cache
+from utils.model_config import model_config
 
-
-_config = _load_config()
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 class UserService:
@@ -49,9 +42,9 @@ class UserService:
                             'user_id': user_id,
                             'flavor_vector': [0] * 5,
                             'diet_type': 'non-veg',
-                            'calorie_goal': float(_config['users']['default_calorie_goal']),
+                            'calorie_goal': float(model_config.get()['users']['default_calorie_goal']),
                             'cuisine_preference': '',
-                            'daily_budget': float(_config['users']['default_budget']),
+                            'daily_budget': float(model_config.get()['users']['default_budget']),
                             'allergies': [],
                             'liked_recipes_flavors': [],
                             'interaction_count': 0,
@@ -69,6 +62,7 @@ class UserService:
         Create or update a user profile from onboarding or request data.
         """
         profile = self._profiles.get(user_id, {})
+        before = dict(profile)
 
         profile['user_id'] = user_id
         profile['flavor_vector'] = data.get(
@@ -78,7 +72,7 @@ class UserService:
         profile['diet_type'] = data.get('diet_type', profile.get('diet_type', 'non-veg'))
         profile['calorie_goal'] = data.get(
             'calorie_goal',
-            float(_config['users']['default_calorie_goal'])
+            float(model_config.get()['users']['default_calorie_goal'])
         )
         profile['cuisine_preference'] = data.get(
             'cuisine_preference',
@@ -86,13 +80,15 @@ class UserService:
         )
         profile['daily_budget'] = data.get(
             'daily_budget',
-            float(_config['users']['default_budget'])
+            float(model_config.get()['users']['default_budget'])
         )
         profile['allergies'] = data.get('allergies', profile.get('allergies', []))
         profile['liked_recipes_flavors'] = profile.get('liked_recipes_flavors', [])
         profile['interaction_count'] = profile.get('interaction_count', 0)
 
         self._profiles[user_id] = profile
+        if before and before != profile:
+            recommendation_cache.invalidate_user(user_id)
         return profile
 
     def update_flavor_from_history(self, user_id: str, liked_recipe_flavor: List[float]):
@@ -113,6 +109,7 @@ class UserService:
         # Pure data-driven: average of all positive interactions
         avg_flavor = np.mean(history, axis=0).tolist()
         profile['flavor_vector'] = avg_flavor
+        recommendation_cache.invalidate_user(user_id)
 
     def build_profile_for_ranking(self, data: dict) -> dict:
         """
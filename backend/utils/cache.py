@@ -1,4 +1,5 @@
 import time
+from collections import OrderedDict
 
 class Cache:
     """Simple in-memory cache with TTL (time-to-live) support."""
@@ -39,5 +40,92 @@ class Cache:
         """Clears all cached data."""
         self._data = {}
 
+class LRUCache:
+    """Size-bounded in-memory cache with least-recently-used eviction."""
+
+    def __init__(self, max_size=1024):
+        """
+        Args:
+            max_size: Maximum number of entries kept before evicting.
+        """
+        self._data = OrderedDict()
+        self.max_size = max(1, int(max_size))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def items(self):
+        """(key, value) pairs, least recently used first (no hit counting)."""
+        return list(self._data.items())
+
+    def get(self, key):
+        """Returns cached value and marks it most recently used, else None."""
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Stores a value, evicting the least recently used entry when full.
+        Returns the evicted (key, value) pair, or None.
+        """
+        if key in self._data:
+            self._data.move_to_end(key)
+            self._data[key] = value
+            return None
+        evicted = self.pop_oldest() if len(self._data) >= self.max_size else None
+        self._data[key] = value
+        return evicted
+
+    def pop(self, key, default=None):
+        """Removes a key without counting it as an eviction."""
+        return self._data.pop(key, default)
+
+    def pop_oldest(self):
+        """Evicts and returns the least recently used (key, value) pair."""
+        if not self._data:
+            return None
+        self.evictions += 1
+        return self._data.popitem(last=False)
+
+    def resize(self, max_size):
+        """Change the bound; returns the (key, value) pairs evicted to fit it."""
+        self.max_size = max(1, int(max_size))
+        evicted = []
+        while len(self._data) > self.max_size:
+            evicted.append(self.pop_oldest())
+        return evicted
+
+    def is_full(self):
+        return len(self._data) >= self.max_size
+
+    def clear(self):
+        """Clears all cached data (counters are kept)."""
+        self._data.clear()
+
+    def get_stats(self):
+        """Returns size and hit/miss/eviction counters."""
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
 # Global cache instance (5 minute default TTL)
 cache = Cache(default_ttl=600)
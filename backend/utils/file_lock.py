@@ -0,0 +1,59 @@
+"""
+Cross-process file lock for FlavorSense AI.
+
+Advisory flock() on a lock file, so only one process of a gunicorn pool
+(or one manual script run) holds it at a time. On platforms without fcntl
+the lock is process-local only.
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock
+    fcntl = None
+
+
+class FileLock:
+    """flock()-based lock; usable as a (blocking) context manager."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._local = threading.Lock()
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Take the lock; with blocking=False returns False if another holder has it."""
+        if not self._local.acquire(blocking):
+            return False
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except OSError:
+                os.close(fd)
+                self._local.release()
+                return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+        self._local.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
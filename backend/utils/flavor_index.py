@@ -0,0 +1,198 @@
+"""
+FlavorIndex — In-process nearest-neighbour index over recipe flavor vectors.
+
+Answers "top-K recipes closest to this user vector" without scoring the
+whole catalog. Vectors are stored unit-normalized, so Euclidean distance
+ranks exactly like cosine similarity (||u - x||² = 2 - 2·cos).
+
+Structure:
+    - KD-tree (NumPy arrays, bounding boxes per node, leaf buckets) over the
+      vectors present at the last build; best-first search prunes nodes whose
+      box is farther than the current K-th best.
+    - Pending buffer for incremental inserts, scanned brute force until it
+      grows past `rebuild_ratio` of the tree, then the tree is rebuilt.
+    - Updates and removals tombstone the old slot; rebuilds compact them.
+Zero flavor vectors (no ingredients) are never in the tree; they score 0
+and only fill the tail of a result that would otherwise be short.
+"""
+import heapq
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+VECTOR_DIM = 5
+
+
+class FlavorIndex:
+    """KD-tree with buffered inserts for cosine top-K retrieval."""
+
+    def __init__(self, leaf_size: int = 128, rebuild_ratio: float = 0.25, min_rebuild: int = 256):
+        self.leaf_size = max(1, int(leaf_size))
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild = min_rebuild
+
+        self._ids: List[str] = []
+        self._slot_of: Dict[str, int] = {}
+        self._vectors = np.zeros((0, VECTOR_DIM))
+        self._alive = np.zeros(0, dtype=bool)
+        self._dead = 0
+
+        # Tree over slots [0, _built) — arrays indexed by node id
+        self._built = 0
+        self._order = np.zeros(0, dtype=np.int64)   # tree position → slot
+        self._points = np.zeros((0, VECTOR_DIM))    # vectors in tree order
+        self._node_lo: List[np.ndarray] = []
+        self._node_hi: List[np.ndarray] = []
+        self._node_range: List[Tuple[int, int]] = []
+        self._node_children: List[Tuple[int, int]] = []
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    # ── Updates ─────────────────────────────────────────────────
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray):
+        """Insert or replace vectors for the given ids."""
+        vectors = np.asarray(vectors, dtype=float).reshape(-1, VECTOR_DIM)
+        if not len(ids):
+            return
+        if any(recipe_id is None for recipe_id in ids):
+            raise ValueError("FlavorIndex ids must not be None")
+        self.remove(ids)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+        first = len(self._ids)
+        for offset, recipe_id in enumerate(ids):
+            self._slot_of[str(recipe_id)] = first + offset
+            self._ids.append(str(recipe_id))
+        self._vectors = np.vstack([self._vectors, unit])
+        self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+
+        pending = len(self._ids) - self._built
+        if pending > max(self.min_rebuild, self.rebuild_ratio * self._built):
+            self.rebuild()
+
+    def remove(self, ids: Iterable[str]):
+        """Tombstone ids; their slots are dropped at the next rebuild."""
+        for recipe_id in ids:
+            slot = self._slot_of.pop(str(recipe_id), None)
+            if slot is not None:
+                self._alive[slot] = False
+                self._dead += 1
+
+    def rebuild(self):
+        """Compact tombstones and rebuild the KD-tree over every live vector."""
+        live = np.flatnonzero(self._alive)
+        self._ids = [self._ids[i] for i in live]
+        self._vectors = self._vectors[live]
+        self._alive = np.ones(len(live), dtype=bool)
+        self._slot_of = {recipe_id: i for i, recipe_id in enumerate(self._ids)}
+        self._dead = 0
+
+        self._built = len(self._ids)
+        self._order = np.flatnonzero(np.any(self._vectors != 0, axis=1))
+        self._node_lo, self._node_hi, self._node_range, self._node_children = [], [], [], []
+        if len(self._order):
+            self._build_node(0, len(self._order))
+        self._points = self._vectors[self._order]
+
+    def _build_node(self, start: int, end: int) -> int:
+        """Recursively split order[start:end] on its widest dimension; returns node id."""
+        pts = self._vectors[self._order[start:end]]
+        node = len(self._node_range)
+        self._node_lo.append(pts.min(axis=0))
+        self._node_hi.append(pts.max(axis=0))
+        self._node_range.append((start, end))
+        self._node_children.append((-1, -1))
+
+        if end - start > self.leaf_size:
+            dim = int(np.argmax(self._node_hi[node] - self._node_lo[node]))
+            mid = (end - start) // 2
+            part = np.argpartition(pts[:, dim], mid)
+            self._order[start:end] = self._order[start:end][part]
+            left = self._build_node(start, start + mid)
+            right = self._build_node(start + mid, end)
+            self._node_children[node] = (left, right)
+        return node
+
+    # ── Queries ─────────────────────────────────────────────────
+
+    def query(self, vector, k: int, allowed: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Top-k (id, cosine similarity) pairs, best first.
+        `allowed` optionally restricts results to a set of ids.
+        """
+        if k <= 0 or not self._slot_of:
+            return []
+        mask = self._alive
+        if allowed is not None:
+            mask = np.zeros_like(self._alive)
+            slots = [self._slot_of[str(i)] for i in allowed if str(i) in self._slot_of]
+            mask[slots] = True
+
+        q = np.asarray(vector, dtype=float).reshape(VECTOR_DIM)
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return [(self._ids[s], 0.0) for s in np.flatnonzero(mask)[:k]]
+        q = q / norm
+
+        best: List[Tuple[float, int]] = []  # max-heap of (-dist², slot)
+
+        def consider(dists: np.ndarray, slots: np.ndarray):
+            if len(best) == k:
+                closer = dists < -best[0][0]
+                dists, slots = dists[closer], slots[closer]
+            for d, s in zip(dists.tolist(), slots.tolist()):
+                if len(best) < k:
+                    heapq.heappush(best, (-d, s))
+                elif d < -best[0][0]:
+                    heapq.heapreplace(best, (-d, s))
+
+        # 1. Pending (unindexed) vectors, brute force
+        pending = np.arange(self._built, len(self._ids))
+        if len(pending):
+            pending = pending[mask[pending] & np.any(self._vectors[pending] != 0, axis=1)]
+            consider(np.sum((self._vectors[pending] - q) ** 2, axis=1), pending)
+
+        # 2. KD-tree, best-first by bounding-box distance
+        if self._node_range:
+            frontier = [(self._box_distance(0, q), 0)]
+            while frontier:
+                bound, node = heapq.heappop(frontier)
+                if len(best) == k and bound >= -best[0][0]:
+                    break
+                left, right = self._node_children[node]
+                if left < 0:
+                    start, end = self._node_range[node]
+                    slots = self._order[start:end]
+                    keep = mask[slots]
+                    if keep.any():
+                        dists = np.sum((self._points[start:end][keep] - q) ** 2, axis=1)
+                        consider(dists, slots[keep])
+                    continue
+                for child in (left, right):
+                    heapq.heappush(frontier, (self._box_distance(child, q), child))
+
+        ranked = sorted((-neg, slot) for neg, slot in best)
+        results = [(self._ids[slot], float(1.0 - d / 2.0)) for d, slot in ranked]
+
+        # 3. Zero vectors only pad a short result
+        if len(results) < k:
+            zero = np.flatnonzero(mask & ~np.any(self._vectors != 0, axis=1))
+            results.extend((self._ids[s], 0.0) for s in zero[:k - len(results)])
+        return results
+
+    def _box_distance(self, node: int, q: np.ndarray) -> float:
+        """Squared distance from q to a node's bounding box."""
+        gap = np.maximum(self._node_lo[node] - q, 0) + np.maximum(q - self._node_hi[node], 0)
+        return float(gap @ gap)
+
+    def get_stats(self) -> dict:
+        return {
+            "size": len(self._slot_of),
+            "indexed": self._built,
+            "pending": len(self._ids) - self._built,
+            "tombstones": self._dead,
+            "nodes": len(self._node_range),
+        }
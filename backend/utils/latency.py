@@ -0,0 +1,52 @@
+"""
+Latency helpers for FlavorSense AI.
+
+CostEstimator keeps an exponentially weighted linear fit of an operation's
+cost against its input size (ms ≈ fixed + per_row × rows), so a caller can
+predict whether a run would fit a latency budget before starting it.
+"""
+import threading
+
+
+class CostEstimator:
+    """EWMA least-squares fit of cost (ms) vs. rows."""
+
+    def __init__(self, alpha: float = 0.1, min_samples: int = 3):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self._samples = 0
+        self._mean_x = self._mean_y = self._mean_xx = self._mean_xy = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, rows: int, ms: float):
+        with self._lock:
+            x, y = float(rows), float(ms)
+            # First sample seeds the averages; later ones decay old history
+            a = 1.0 if self._samples == 0 else self.alpha
+            self._mean_x += a * (x - self._mean_x)
+            self._mean_y += a * (y - self._mean_y)
+            self._mean_xx += a * (x * x - self._mean_xx)
+            self._mean_xy += a * (x * y - self._mean_xy)
+            self._samples += 1
+
+    def estimate(self, rows: int) -> float:
+        """Predicted ms for `rows`; 0.0 until min_samples have been observed."""
+        with self._lock:
+            if self._samples < self.min_samples:
+                return 0.0
+            var = self._mean_xx - self._mean_x ** 2
+            if var > 1e-9:
+                slope = max(0.0, (self._mean_xy - self._mean_x * self._mean_y) / var)
+            else:
+                # All observations had the same size: scale proportionally
+                slope = self._mean_y / self._mean_x if self._mean_x > 0 else 0.0
+                return slope * rows
+            intercept = max(0.0, self._mean_y - slope * self._mean_x)
+            return intercept + slope * rows
+
+    def get_stats(self) -> dict:
+        return {
+            "samples": self._samples,
+            "mean_rows": round(self._mean_x, 1),
+            "mean_ms": round(self._mean_y, 3),
+        }
@@ -0,0 +1,125 @@
+"""
+Shared model_config.yaml for FlavorSense AI.
+
+The file is parsed once and served as an immutable snapshot (mappings are
+read-only, lists become tuples), so request paths never parse YAML and no
+caller can change settings another module sees.
+
+    from utils.model_config import model_config
+    config = model_config.get()            # current ConfigSnapshot
+    config['model']['top_n']
+
+get() re-checks the file's mtime at most every RELOAD_CHECK_SECONDS; an
+edited file is re-parsed and swapped in, and subscribers are called with
+(new, old) snapshots so they can resize caches or rebuild helpers. A file
+that fails to parse is reported and the previous snapshot stays live.
+"""
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional
+
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'model_config.yaml')
+RELOAD_CHECK_SECONDS = 1.0
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class ConfigSnapshot(Mapping):
+    """One parsed, read-only version of model_config.yaml."""
+
+    def __init__(self, data: dict, mtime: Optional[float], version: int):
+        self._data = _freeze(data or {})
+        self.mtime = mtime
+        self.version = version
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def section(self, name: str) -> Mapping:
+        """A top-level section, empty if missing or null."""
+        return self._data.get(name) or MappingProxyType({})
+
+    def value(self, section: str, key: str, default: Any = None) -> Any:
+        """section.key, or `default` when either is missing."""
+        return self.section(section).get(key, default)
+
+
+class ModelConfig:
+    """Cached, mtime-reloaded model_config.yaml with change subscribers."""
+
+    def __init__(self, path: str = CONFIG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[ConfigSnapshot, ConfigSnapshot], None]] = []
+        self._next_check = 0.0
+        self._failed_mtime: Optional[float] = None
+        self._snapshot = self._parse(_mtime(path), version=1) or ConfigSnapshot({}, None, 1)
+
+    def _parse(self, mtime: Optional[float], version: int) -> Optional[ConfigSnapshot]:
+        try:
+            with open(self.path, 'r') as f:
+                return ConfigSnapshot(yaml.safe_load(f), mtime, version)
+        except Exception as e:
+            print(f"[ModelConfig] Could not load {self.path}: {e}")
+            return None
+
+    def get(self) -> ConfigSnapshot:
+        """Current snapshot (reloaded first if the file changed)."""
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._snapshot
+
+    def reload_if_changed(self) -> bool:
+        with self._lock:
+            self._next_check = time.monotonic() + RELOAD_CHECK_SECONDS
+            mtime = _mtime(self.path)
+            old = self._snapshot
+            if mtime is None or mtime in (old.mtime, self._failed_mtime):
+                return False
+            new = self._parse(mtime, old.version + 1)
+            if new is None:
+                # Keep serving the last good config; retry when the file changes again
+                self._failed_mtime = mtime
+                return False
+            self._snapshot = new
+            subscribers = list(self._subscribers)
+        print(f"[ModelConfig] Reloaded {os.path.basename(self.path)} (v{new.version})")
+        for callback in subscribers:
+            try:
+                callback(new, old)
+            except Exception as e:
+                print(f"[ModelConfig] Subscriber {getattr(callback, '__qualname__', callback)} failed: {e}")
+        return True
+
+    def subscribe(self, callback: Callable[[ConfigSnapshot, ConfigSnapshot], None]):
+        """Call callback(new, old) after every reload."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+# Singleton
+model_config = ModelConfig()
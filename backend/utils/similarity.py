@@ -12,3 +12,60 @@ def calculate_similarity(vector_a: np.ndarray, vector_b: np.ndarray) -> float:
         return 0.0
         
     return np.dot(vector_a, vector_b) / (norm_a * norm_b)
+
+
+def batch_cosine_similarity(user_vectors: np.ndarray, recipe_matrix: np.ndarray,
+                            recipe_norms: np.ndarray = None) -> np.ndarray:
+    """
+    Cosine similarity of one or many user vectors against an (N, 5) recipe matrix.
+
+    Args:
+        user_vectors: (5,) or (M, 5).
+        recipe_matrix: (N, 5).
+        recipe_norms: Optional precomputed (N,) row norms of recipe_matrix.
+
+    Returns:
+        (N,) for a single user vector, (M, N) otherwise. Zero vectors score 0.
+    """
+    users = np.asarray(user_vectors, dtype=float)
+    single = users.ndim == 1
+    users = np.atleast_2d(users)
+    recipes = np.asarray(recipe_matrix, dtype=float).reshape(-1, users.shape[1])
+
+    if recipe_norms is None:
+        recipe_norms = np.linalg.norm(recipes, axis=1)
+    user_norms = np.linalg.norm(users, axis=1)
+
+    denom = np.outer(user_norms, recipe_norms)
+    scores = np.divide(users @ recipes.T, denom, out=np.zeros_like(denom), where=denom > 0)
+    return scores[0] if single else scores
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores along the last axis, best first.
+    Uses argpartition (O(N)) and only sorts the k selected entries.
+    Ties keep their original order, including ties at the k-th score:
+    the lowest indices among them are the ones selected.
+    """
+    scores = np.asarray(scores)
+    n = scores.shape[-1]
+    k = max(0, min(int(k), n))
+    if k == 0:
+        return np.zeros(scores.shape[:-1] + (0,), dtype=np.int64)
+
+    if k < n:
+        # k-th highest score per row; argpartition alone picks arbitrary
+        # members of a tie that straddles it, so choose them by index
+        kth = -np.partition(-scores, k - 1, axis=-1)[..., k - 1:k]
+        above = scores > kth
+        tied = scores == kth
+        need = k - above.sum(axis=-1, keepdims=True)
+        selected = above | (tied & (np.cumsum(tied, axis=-1) <= need))
+        candidates = np.argpartition(~selected, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    picked = np.take_along_axis(scores, candidates, axis=-1)
+    # Sort selected entries by score desc, then by original index for stable ties
+    order = np.lexsort((candidates, -picked), axis=-1)
+    return np.take_along_axis(candidates, order, axis=-1)
@@ -0,0 +1,47 @@
+import sys
+import os
+import numpy as np
+from xgboost import DMatrix, XGBRegressor
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from features.feature_builder import FEATURE_NAMES
+from ml.compiled_model import CompiledForest
+
+
+def _fit(missing_rate=0.1, seed=7):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(400, len(FEATURE_NAMES))).astype(np.float32)
+    X[rng.random(X.shape) < missing_rate] = np.nan
+    y = np.nan_to_num(X[:, 0]) * 2 - np.nan_to_num(X[:, 3]) + rng.normal(scale=0.1, size=len(X))
+    model = XGBRegressor(n_estimators=30, max_depth=4, learning_rate=0.2, random_state=seed, verbosity=0)
+    model.fit(X, y)
+    return model, rng
+
+
+def test_predict_matches_xgboost():
+    model, rng = _fit()
+    forest = CompiledForest.from_xgboost(model)
+    X = rng.normal(size=(200, len(FEATURE_NAMES))).astype(np.float32)
+    # No NaNs takes the bit-vector path, any NaN the tree-walk path
+    assert np.allclose(forest.predict(X), model.predict(X), atol=1e-5), "Compiled predict should match XGBoost"
+    X[rng.random(X.shape) < 0.2] = np.nan
+    assert np.allclose(forest.predict(X), model.predict(X), atol=1e-5), "Missing values should follow default directions"
+
+
+def test_contributions_match_xgboost():
+    model, rng = _fit()
+    forest = CompiledForest.from_xgboost(model)
+    X = rng.normal(size=(100, len(FEATURE_NAMES))).astype(np.float32)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    expected = model.get_booster().predict(DMatrix(X), pred_contribs=True, approx_contribs=True)
+    contribs = forest.contributions(X)
+    assert contribs.shape == expected.shape
+    assert np.allclose(contribs, expected, atol=1e-4), "Contributions should match XGBoost (Saabas)"
+    assert np.allclose(contribs.sum(axis=1), forest.predict_margin(X), atol=1e-4), "Rows should sum to the margin"
+
+
+if __name__ == "__main__":
+    test_predict_matches_xgboost()
+    test_contributions_match_xgboost()
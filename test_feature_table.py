@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+import numpy as np
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from features.feature_builder import build_features
+from services.recipe_catalog import RecipeCatalog
+
+RECIPES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'data', 'recipes_cache.json')
+
+USERS = [
+    {"flavor_vector": [0.3, 0.2, 0.1, 0.5, 0.4], "diet_type": "vegan", "calorie_goal": 1800,
+     "cuisine_preference": "Indian", "daily_budget": 30},
+    {"flavor_vector": [0.9, 0.0, 0.1, 0.0, 0.2], "diet_type": "keto", "calorie_goal": 2500,
+     "cuisine_preference": "", "daily_budget": 12},
+    {},
+]
+
+
+def _load_recipes():
+    with open(RECIPES_PATH, 'r') as f:
+        return json.load(f)
+
+
+def _assert_matches(table, recipes):
+    ids = [r['id'] for r in recipes]
+    for user in USERS:
+        expected = np.array([build_features(user, r) for r in recipes], dtype=np.float32)
+        assert np.allclose(table.features_for(user, ids), expected, atol=1e-5), "Feature table should match build_features"
+
+
+def test_feature_table_matches_build_features():
+    recipes = _load_recipes()
+    catalog = RecipeCatalog(max_recipes=len(recipes))
+    _assert_matches(catalog.feature_table(ensure=recipes), recipes)
+
+
+def test_patched_feature_table_matches_build_features():
+    recipes = _load_recipes()
+    catalog = RecipeCatalog(max_recipes=len(recipes))
+    catalog.feature_table(ensure=recipes)
+    # Changed inputs, changed ingredients and a new recipe: patched, not rebuilt
+    changed = [
+        {**recipes[0], "price": 99.0, "tags": ["vegan", "keto"]},
+        {**recipes[1], "ingredients": list(recipes[1].get("ingredients", [])) + ["chili"]},
+        {**recipes[2], "id": "test-new-recipe", "cuisine": "Thai"},
+    ]
+    catalog.upsert(changed)
+    _assert_matches(catalog.feature_table(), changed + recipes[3:])
+
+
+if __name__ == "__main__":
+    test_feature_table_matches_build_features()
+    test_patched_feature_table_matches_build_features()
@@ -0,0 +1,32 @@
+import sys
+import os
+import numpy as np
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from utils.similarity import top_k_indices
+
+
+def _stable_top_k(scores, k):
+    return np.argsort(-scores, axis=-1, kind='stable')[..., :k]
+
+
+def test_top_k_matches_stable_sort():
+    rng = np.random.default_rng(3)
+    # Few distinct values, so most k cut through a tie
+    scores = rng.integers(0, 4, size=(50, 40)).astype(float)
+    for k in (0, 1, 5, 17, 39, 40, 60):
+        expected = _stable_top_k(scores, min(k, 40))
+        assert np.array_equal(top_k_indices(scores, k), expected), f"k={k} should rank like a stable sort"
+        assert np.array_equal(top_k_indices(scores[0], k), expected[0]), f"k={k} on a 1-D row"
+
+
+def test_tie_at_kth_keeps_lowest_indices():
+    scores = np.array([0.5, 0.9, 0.5, 0.5, 0.1, 0.5])
+    assert list(top_k_indices(scores, 3)) == [1, 0, 2], "Tied scores should keep their original order"
+
+
+if __name__ == "__main__":
+    test_top_k_matches_stable_sort()
+    test_tie_at_kth_keeps_lowest_indices()